@@ -1,14 +1,18 @@
+import logging
+import sys
 import threading
+
+import instrumentation
 from texttwistgame import TextTwistGame
-from ui import TextTwistUI
+from ui import TextTwistUI, PUZZLE_WORD_LENGTH
 
 
 def handle_thread_exceptions(*args):
     """
     Consume any exceptions from spawned threads
 
-    The game only spawns a single clock thread. Exiting the program
-    while this clock thread is running raises a runtime exception,
+    The game only spawns a single timer service thread. Exiting the program
+    while a clock is running raises a runtime exception in this thread,
     which we don't need to handle (in the current iteration
     of this program).
     """
@@ -18,13 +22,21 @@ def handle_thread_exceptions(*args):
 if __name__ == "__main__":
     """
     Main application start location
+
+    Usage: python app.py [RACK_LENGTH]
     """
 
     # redefine hook for thread exceptions
     threading.excepthook = handle_thread_exceptions
 
-    ui = TextTwistUI()
-    game = TextTwistGame()
+    # show the periodic instrumentation summary line
+    if instrumentation.enabled:
+        logging.basicConfig(level=logging.INFO)
+
+    rack_length = int(sys.argv[1]) if len(sys.argv) > 1 else PUZZLE_WORD_LENGTH
+
+    ui = TextTwistUI(rack_length)
+    game = TextTwistGame(rack_length=rack_length)
 
     ui.add_game_object_to_ui(game)
     ui.start_mainloop()
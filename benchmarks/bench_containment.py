@@ -0,0 +1,66 @@
+"""
+bench_containment.py
+
+Micro-benchmark for the word containment check: scan all of
+allwords.txt for the words that fit a rack, with the Counter based
+check, with 'base_word_contains_test_word', with the precomputed
+letter mask scan, and with the packed letter count scan.
+"""
+
+import os
+import random
+import sys
+import timeit
+
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from words import *
+
+NUM_RACKS = 20
+REPEAT = 3
+SEED = 0
+
+
+def counter_contains_test_word(base_word, test_word):
+    """
+    The Counter based containment check, as it was before the letter
+    mask prefilter, for reference.
+    """
+    base_word = Counter(base_word)
+    base_word.subtract(Counter(test_word))
+    return min(base_word.values()) >= 0
+
+
+def scan_with(check, racks, word_list):
+    """
+    Scan 'word_list' for the words that fit each rack using 'check'.
+    """
+    return [[word for word in word_list if check(rack, word)]
+            for rack in racks]
+
+
+if __name__ == "__main__":
+    word_list = load_compiled_word_file(ALL_WORDS_FILE)["words"]
+    base_words = load_compiled_word_file(SIX_LETTER_WORD_FILE)["words"]
+    racks = random.Random(SEED).sample(base_words, NUM_RACKS)
+
+    candidates = {
+        "Counter": lambda: scan_with(counter_contains_test_word, racks,
+            word_list),
+        "base_word_contains_test_word": lambda: scan_with(
+            base_word_contains_test_word, racks, word_list),
+        "scan_words_in_rack": lambda: [scan_words_in_rack(rack)
+            for rack in racks],
+        "scan_words_in_rack_packed": lambda: [scan_words_in_rack_packed(rack)
+            for rack in racks],
+    }
+
+    print(f"{NUM_RACKS} racks x {len(word_list)} words, best of {REPEAT}")
+    baseline = None
+    for name, func in candidates.items():
+        seconds = min(timeit.repeat(func, number=1, repeat=REPEAT))
+        per_rack = seconds / NUM_RACKS * 1000
+        baseline = baseline or seconds
+        print(f"{name:30} {per_rack:8.2f} ms/rack "
+                f"{baseline / seconds:6.1f}x")
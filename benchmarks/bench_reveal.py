@@ -0,0 +1,149 @@
+"""
+bench_reveal.py
+
+Micro-benchmark for the end-of-level reveal of the missing words in
+the tkinter UI, on a large solution set (the ten letter rack with the
+most solutions in a sample of the extended word list). Compares the
+label scan the UI used before it kept a label per word with the
+current word -> label lookup. Needs a display, unless run with
+--headless, which reveals into stub labels that count how often their
+options are read or written.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from texttwistgame import TextTwistGame, get_shared_puzzle
+from ui import TextTwistUI
+from words import *
+
+RACK_LENGTH = MAX_RACK_LENGTH
+NUM_SAMPLED_RACKS = 300
+REPEAT = 5
+SEED = 0
+
+
+class FixedPuzzleGame(TextTwistGame):
+    """
+    Game whose every level is the same puzzle.
+    """
+
+    def __init__(self, base_word, **kwargs):
+        self.base_word = base_word
+        super().__init__(**kwargs)
+
+
+    def generate_puzzle(self, rng):
+        return get_shared_puzzle(self.dictionary, self.base_word)
+
+
+class StubLabel:
+    """
+    Stand-in for a tkinter label that counts the lookups (reads and
+    writes) of its options in 'lookups'.
+    """
+
+    lookups = 0
+
+    def __init__(self, text):
+        self.options = {"text": text, "fg": "black"}
+
+
+    def __getitem__(self, key):
+        StubLabel.lookups += 1
+        return self.options[key]
+
+
+    def __setitem__(self, key, value):
+        StubLabel.lookups += 1
+        self.options[key] = value
+
+
+    def config(self, **options):
+        StubLabel.lookups += 1
+        self.options.update(options)
+
+
+class HeadlessUI:
+    """
+    The parts of TextTwistUI that the reveal uses, over stub labels.
+    """
+
+    display_missing_words = TextTwistUI.display_missing_words
+    add_word_to_solution_area = TextTwistUI.add_word_to_solution_area
+
+    def __init__(self, game):
+        self.game = game
+
+
+    def start_game(self):
+        self.game.start_game()
+        self.solution_labels = {word: StubLabel("_" * len(word)) for word
+                in sorted(self.game.get_wordlist(), key=len)}
+
+
+def scan_reveal(ui):
+    """
+    The label scan reveal, as it was before the word -> label mapping,
+    for reference: each missing word searches for the first blank
+    label of its length, reading the text of every label on the way.
+    """
+    labels = list(ui.solution_labels.values())
+    for word in sorted(ui.game.get_missing_solution_words(), key=len):
+        for label in labels:
+            if "_" in label['text'] and len(label['text']) == len(word):
+                label['text'] = word
+                label['fg'] = "red"
+                break
+
+
+def time_reveal(ui, reveal):
+    """
+    Start a level and time revealing all of its words with 'reveal',
+    best of REPEAT. Return the time and the number of stub label
+    lookups of one reveal (0 with real labels).
+    """
+    timings = []
+    for _ in range(REPEAT):
+        ui.start_game()
+        ui.game.reset_clock()
+        StubLabel.lookups = 0
+        start = time.perf_counter()
+        reveal(ui)
+        timings.append(time.perf_counter() - start)
+    return min(timings), StubLabel.lookups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--headless", action="store_true",
+            help="reveal into stub labels, without a display")
+    args = parser.parse_args()
+
+    dictionary = get_rack_dictionary(RACK_LENGTH)
+    random.seed(SEED)
+    racks = {dictionary.random_base_word() for _ in range(NUM_SAMPLED_RACKS)}
+    base_word = max(sorted(racks), key=lambda rack:
+            len(dictionary.solutions(rack)))
+
+    game = FixedPuzzleGame(base_word, rack_length=RACK_LENGTH)
+    if args.headless:
+        ui = HeadlessUI(game)
+    else:
+        ui = TextTwistUI(RACK_LENGTH)
+        ui.add_game_object_to_ui(game)
+
+    num_words = len(dictionary.solutions(base_word))
+    print(f"{base_word}: {num_words} solution words, best of {REPEAT}")
+    baseline = None
+    for name, reveal in (("label scan", scan_reveal),
+            ("word -> label", TextTwistUI.display_missing_words)):
+        seconds, lookups = time_reveal(ui, reveal)
+        baseline = baseline or seconds
+        print(f"{name:15} {seconds * 1000:8.2f} ms "
+                f"{baseline / seconds:6.1f}x"
+                + (f" {lookups:8} label lookups" if args.headless else ""))
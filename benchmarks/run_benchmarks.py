@@ -0,0 +1,271 @@
+"""
+run_benchmarks.py
+
+Benchmark suite for the word engine and the game loop. Runs without a
+display, over fixed seeds, against the shipped word lists. Results are
+saved as JSON and compared with a stored baseline, so a regression in
+puzzle generation latency shows up as a ratio above the threshold.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--output FILE] [--baseline FILE]
+        [--update-baseline] [--threshold RATIO] [--only NAME ...]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from clock import Clock
+from rack import Rack
+from texttwistgame import GAME_TIME, TextTwistGame
+from words import *
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCHMARK_DIR, "results.json")
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+SEED = 1234
+REPEAT = 5
+REGRESSION_THRESHOLD = 1.5
+
+# name -> function(rng) returning (setup, body, operations per body call)
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """
+    Register a benchmark under the name of its function.
+    """
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def sample_base_words(rng, count):
+    """
+    Draw 'count' base words from 6letterwords.txt with 'rng'.
+    """
+    base_words = load_compiled_word_file(SIX_LETTER_WORD_FILE)["words"]
+    return rng.sample(base_words, count)
+
+
+def headless_game():
+    """
+    Create a game with its own clock and puzzle seed.
+    """
+    return TextTwistGame(clock=Clock(GAME_TIME), seed=SEED)
+
+
+@benchmark
+def get_six_letter_word_latency(rng):
+    calls = 1000
+    def setup():
+        random.seed(SEED)
+    def body():
+        for _ in range(calls):
+            get_six_letter_word()
+    return setup, body, calls
+
+
+@benchmark
+def get_words_from_base_word_latency(rng):
+    base_words = sample_base_words(rng, 1000)
+    def setup():
+        get_word_dictionary().solution_cache.clear()
+    def body():
+        for base_word in base_words:
+            get_words_from_base_word(base_word)
+    return setup, body, len(base_words)
+
+
+@benchmark
+def get_words_from_base_word_cached_latency(rng):
+    base_words = sample_base_words(rng, 1000)
+    def setup():
+        for base_word in base_words:
+            get_words_from_base_word(base_word)
+    def body():
+        for base_word in base_words:
+            get_words_from_base_word(base_word)
+    return setup, body, len(base_words)
+
+
+@benchmark
+def base_word_contains_test_word_throughput(rng):
+    base_words = sample_base_words(rng, 20)
+    test_words = rng.sample(load_compiled_word_file(ALL_WORDS_FILE)["words"],
+            500)
+    def body():
+        for base_word in base_words:
+            for test_word in test_words:
+                base_word_contains_test_word(base_word, test_word)
+    return None, body, len(base_words) * len(test_words)
+
+
+@benchmark
+def scan_words_in_rack_packed_throughput(rng):
+    base_words = sample_base_words(rng, 20)
+    num_words = len(load_compiled_word_file(ALL_WORDS_FILE)["words"])
+    def body():
+        for base_word in base_words:
+            scan_words_in_rack_packed(base_word)
+    return None, body, len(base_words) * num_words
+
+
+@benchmark
+def start_game_latency(rng):
+    calls = 200
+    game = headless_game()
+    def setup():
+        game.reset_game()
+        game.random.seed(SEED)
+    def body():
+        for _ in range(calls):
+            game.start_game()
+        game.reset_clock()
+    return setup, body, calls
+
+
+@benchmark
+def word_entry_is_valid_throughput(rng):
+    game = headless_game()
+    attempts = []
+    def setup():
+        game.reset_game()
+        game.random.seed(SEED)
+        game.start_game()
+        solutions = sorted(game.get_wordlist())
+        # valid, repeated and invalid entries
+        attempts[:] = solutions + solutions + \
+            [word[::-1] + "Q" for word in solutions]
+    def body():
+        for word in attempts:
+            game.word_entry_is_valid(word)
+        game.reset_clock()
+    setup()
+    return setup, body, len(attempts)
+
+
+@benchmark
+def rack_keystroke_latency(rng):
+    rack = Rack(MAX_WORD_LENGTH)
+    words = sample_base_words(rng, 200)
+    def body():
+        for word in words:
+            rack.set_letters(word)
+            for letter in word:
+                rack.type_letter(letter)
+            rack.word()
+            while rack.backspace():
+                pass
+    return None, body, len(words) * MAX_WORD_LENGTH * 2
+
+
+def rack_solutions_latency(rack_length):
+    """
+    Make a benchmark of solving racks of 'rack_length' letters.
+    """
+    def solutions_latency(rng):
+        dictionary = get_rack_dictionary(rack_length)
+        random.seed(SEED)
+        racks = [dictionary.random_base_word() for _ in range(200)]
+        def setup():
+            dictionary.solution_cache.clear()
+        def body():
+            for rack in racks:
+                dictionary.solutions(rack)
+        return setup, body, len(racks)
+    return solutions_latency
+
+
+for rack_length in range(MAX_WORD_LENGTH, MAX_RACK_LENGTH + 1):
+    BENCHMARKS[f"solutions_latency_rack_{rack_length}"] = \
+        rack_solutions_latency(rack_length)
+
+
+def run_benchmark(name):
+    """
+    Run one benchmark. Return the best time per operation over
+    REPEAT runs, in microseconds.
+    """
+    setup, body, operations = BENCHMARKS[name](random.Random(SEED))
+    timings = []
+    for _ in range(REPEAT):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        body()
+        timings.append(time.perf_counter() - start)
+    return min(timings) / operations * 1e6
+
+
+def run_suite(names):
+    """
+    Run the named benchmarks, after loading the word lists once so
+    that the first benchmark does not pay for it.
+    """
+    get_words_from_base_word(get_six_letter_word())
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "seed": SEED,
+        "benchmarks": {name: {"per_op_us": round(run_benchmark(name), 4)}
+            for name in names},
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Print each result next to its baseline. Return the names of the
+    benchmarks that are slower than the baseline by more than
+    'threshold' times.
+    """
+    regressions = []
+    print(f"{'benchmark':42} {'us/op':>10} {'baseline':>10} {'ratio':>7}")
+    for name, result in results["benchmarks"].items():
+        per_op = result["per_op_us"]
+        base = baseline.get("benchmarks", {}).get(name, {}).get("per_op_us")
+        if base:
+            ratio = per_op / base
+            flag = "  REGRESSION" if ratio > threshold else ""
+            if flag:
+                regressions.append(name)
+            print(f"{name:42} {per_op:10.3f} {base:10.3f} {ratio:7.2f}{flag}")
+        else:
+            print(f"{name:42} {per_op:10.3f} {'-':>10} {'-':>7}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float,
+            default=REGRESSION_THRESHOLD)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+            default=list(BENCHMARKS))
+    args = parser.parse_args()
+
+    results = run_suite(args.only)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to '{args.baseline}'.")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold}x.")
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+buildwords.py
+
+Word list build pipeline. Derives the game's word lists from a raw
+dictionary (one entry per line, e.g. wordlists/original_wordlist):
+
+    allwords.txt        solution words, MIN_WORD_LENGTH to MAX_WORD_LENGTH
+    6letterwords.txt    six letter base words
+    extendedwords.txt   solution and base words for racks of up to
+                        MAX_RACK_LENGTH letters
+
+then compiles their indexes and rebuilds the puzzle catalog.
+
+The raw dictionary is read once, line by line, through a chain of
+generator stages, so memory use grows with the number of distinct
+words kept, not with the size of the source.
+
+Usage:
+    python buildwords.py [--source FILE] [--output-dir DIR]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from words import *
+from words import _compiled_word_files
+
+# output file name -> (shortest, longest) word length
+OUTPUT_FILES = {
+    os.path.basename(ALL_WORDS_FILE): (MIN_WORD_LENGTH, MAX_WORD_LENGTH),
+    os.path.basename(SIX_LETTER_WORD_FILE): (MAX_WORD_LENGTH, MAX_WORD_LENGTH),
+    os.path.basename(EXTENDED_WORDS_FILE): (MIN_WORD_LENGTH, MAX_RACK_LENGTH),
+}
+
+
+def read_entries(source_file):
+    """
+    Generate the entries of a raw dictionary file, stripped of
+    surrounding whitespace. Blank lines are skipped.
+    """
+    with open(source_file, "r", encoding="utf-8", errors="replace") as source:
+        for line in source:
+            entry = line.strip()
+            if entry:
+                yield entry
+
+
+def drop_possessives(entries):
+    """
+    Drop possessive entries, e.g. "cat's".
+    """
+    return (entry for entry in entries if "'" not in entry)
+
+
+def drop_proper_nouns(entries):
+    """
+    Drop proper nouns and abbreviations, i.e. entries that start with
+    a capital letter.
+    """
+    return (entry for entry in entries if not entry[0].isupper())
+
+
+def drop_non_alpha(entries):
+    """
+    Drop entries with anything but the letters a-z, e.g. accented
+    letters, digits, hyphens or spaces.
+    """
+    return (entry for entry in entries if entry.isascii() and entry.isalpha())
+
+
+def normalise_case(entries):
+    """
+    Convert entries to upper case, like the words in the word lists.
+    """
+    return map(str.upper, entries)
+
+
+def dedupe(words):
+    """
+    Drop repeated words, keeping the first occurrence of each.
+    """
+    seen = set()
+    for word in words:
+        if word not in seen:
+            seen.add(word)
+            yield word
+
+
+def filter_length(words, shortest, longest):
+    """
+    Keep the words with 'shortest' to 'longest' letters.
+    """
+    return (word for word in words if shortest <= len(word) <= longest)
+
+
+def clean_words(source_file):
+    """
+    Generate the playable words of a raw dictionary file, in order:
+    the output of all stages of the pipeline.
+    """
+    shortest = min(low for low, _ in OUTPUT_FILES.values())
+    longest = max(high for _, high in OUTPUT_FILES.values())
+    entries = read_entries(source_file)
+    entries = drop_non_alpha(drop_proper_nouns(drop_possessives(entries)))
+    return filter_length(dedupe(normalise_case(entries)), shortest, longest)
+
+
+def write_word_lists(words, output_dir):
+    """
+    Write each word to every output file whose length range it fits,
+    in one pass. Return a dict of output file path -> word count.
+
+    The output files are replaced atomically once all are written, so
+    a process that has a word list mapped never sees it half written.
+    """
+    counts = {}
+    files = {}
+    try:
+        for name, length_range in OUTPUT_FILES.items():
+            path = os.path.join(output_dir, name)
+            files[path] = (open(f"{path}.{os.getpid()}.tmp", "w"),
+                    length_range)
+            counts[path] = 0
+
+        for word in words:
+            for path, (output, (shortest, longest)) in files.items():
+                if shortest <= len(word) <= longest:
+                    output.write(word + "\n")
+                    counts[path] += 1
+    except BaseException:
+        for output, _ in files.values():
+            output.close()
+            os.remove(output.name)
+        raise
+
+    for path, (output, _) in files.items():
+        output.close()
+        os.replace(output.name, path)
+    return counts
+
+
+def build_word_lists(source_file=ORIGINAL_WORD_FILE, output_dir=WORDLIST_DIR):
+    """
+    Build all word lists from 'source_file' into 'output_dir', compile
+    their indexes, and rebuild the puzzle catalog. Return a dict of
+    output file path -> word count.
+    """
+    counts = write_word_lists(clean_words(source_file), output_dir)
+
+    for path in counts:
+        _compiled_word_files.pop(path, None)
+        write_compiled_word_file(compile_word_file(path),
+                path + COMPILED_FILE_SUFFIX)
+
+    catalog_file = os.path.join(output_dir,
+            os.path.basename(PUZZLE_CATALOG_FILE))
+    build_puzzle_catalog(catalog_file,
+            os.path.join(output_dir, os.path.basename(SIX_LETTER_WORD_FILE)),
+            os.path.join(output_dir, os.path.basename(ALL_WORDS_FILE)))
+
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the word lists from "
+            "a raw dictionary")
+    parser.add_argument("--source", default=ORIGINAL_WORD_FILE)
+    parser.add_argument("--output-dir", default=WORDLIST_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = build_word_lists(args.source, args.output_dir)
+    elapsed = time.perf_counter() - start
+
+    for path, count in counts.items():
+        print(f"{os.path.basename(path)}: {count} words")
+    print(f"Built in {elapsed:.2f} s", file=sys.stderr)
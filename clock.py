@@ -1,61 +1,181 @@
-from threading import Event
-from tkinter import StringVar
+import heapq
+import itertools
+import math
+import sys
+import threading
 
-from time import sleep
+from threading import Event, Lock
+
+from time import monotonic
 
 class Clock():
     """
     Class to encapsulate a text twist game clock. Provides mechanisms
     for running the clock, resetting it, and notifying observers when
     notable events occur (i.e. clock reaches zero)
+
+    A running clock stores the monotonic deadline at which it reaches
+    zero, and computes the time left from it when asked. Display
+    updates and the zero notification are fired by a TimerService,
+    which is shared by all clocks, so a running clock has no thread
+    of its own.
+
+    Each call to 'start' begins a new run of the clock, owned by the
+    ClockHandle it returns.
+
+    The clock does not depend on any UI toolkit. Its text is kept in
+    'string_var', and every change of the text is passed to the
+    functions in 'display_observers', e.g. to update a clock label.
     """
 
-    def __init__(self, default_time=120):
+    def __init__(self, default_time=120, string_var=None, timer_service=None):
         """
-        Initialize a clock with a StringVar (used by tkinter),
-        a default time, an observers set, and an exit event.
+        Initialize a clock with a default time, a text variable (a new
+        TextVariable unless 'string_var' is given), observer sets, and
+        a timer service.
         """
-        self.string_var = StringVar()
+        self.string_var = TextVariable() if string_var is None else string_var
+        self.display_observers = set()
         self.__default_time = default_time
-        self.__seconds = default_time
+        self.__seconds = default_time   # time left while stopped
+        self.__deadline = None          # monotonic deadline while running
+        self.__timer = None             # next display update or expiry
+        self.__handle = None            # handle of the current run
 
         self.observers = set()
 
-        self.__exit = Event()
-        self.__reset = Event()
+        self.__timer_service = timer_service or get_timer_service()
+        self.__lock = Lock()
 
-        self.string_var.set(str(self))
+        self._display()
 
 
     def _get_time(self):
         """
         Get current time on the clock in seconds
         """
-        return self.__seconds
+        deadline = self.__deadline
+        if deadline is None:
+            return self.__seconds
+        return max(0, math.ceil(deadline - monotonic()))
+
+
+    def is_running(self):
+        """
+        Check if the clock is counting down.
+        """
+        return self.__deadline is not None
+
+
+    def start(self):
+        """
+        Start a new run of the clock from the default time, without
+        waiting for it to reach zero. Return the ClockHandle that owns
+        the run. If the clock was running, its previous run ends.
+        """
+        with self.__lock:
+            self._stop(self.__default_time)
+            self.__handle = ClockHandle(self)
+            self.__deadline = monotonic() + self.__default_time
+            self._schedule_update()
+            handle = self.__handle
+        self._display()
+        return handle
 
 
     def run(self):
         """
-        Reset the clock to default time and start
+        Reset the clock to default time, start it, and wait until it
+        reaches zero or is stopped.
         """
-        self.reset()            # reset clock to starting state
-        self.__exit.clear()     # clock exit event should be unset at start
-        while True:
+        self.start().wait()
+
+
+    def _schedule_update(self):
+        """
+        Schedule the next display update, at the moment the displayed
+        seconds next change, or the expiry if the clock is about to
+        reach zero. Must be called with the lock held.
+        """
+        if self.__timer is not None:
+            self.__timer.cancel()
+        remaining = self.__deadline - monotonic()
+        next_update = self.__deadline - max(0, math.ceil(remaining) - 1)
+        self.__timer = self.__timer_service.schedule(next_update,
+                self._update)
+
+
+    def _update(self):
+        """
+        Timer callback: update the display, and notify the observers
+        if the clock reached zero.
+        """
+        with self.__lock:
+            if self.__deadline is None:
+                return
+            reached_zero = self.__deadline <= monotonic()
+            if reached_zero:
+                self._stop(0, expired=True)
+            else:
+                self._schedule_update()
+
+        self._display()
+        if reached_zero:
+            self._notify_clock_reached_zero()
+
+
+    def _stop(self, seconds, expired=False):
+        """
+        Stop the clock at 'seconds', ending the current run. Must be
+        called with the lock held.
+        """
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        self.__deadline = None
+        self.__seconds = seconds
+        if self.__handle is not None:
+            self.__handle._finish(expired)
+            self.__handle = None
+
+
+    def _cancel(self, handle):
+        """
+        Stop the run owned by 'handle' and reset the clock to the
+        default time, without notifying observers. Return False if
+        'handle' no longer owns a run.
+        """
+        with self.__lock:
+            if handle is not self.__handle:
+                return False
+            self._stop(self.__default_time)
+        self._display()
+        return True
+
+
+    def _restart(self, handle):
+        """
+        Restart the run owned by 'handle' from the default time.
+        Return False if 'handle' no longer owns a run.
+        """
+        with self.__lock:
+            if handle is not self.__handle:
+                return False
+            self.__deadline = monotonic() + self.__default_time
+            self._schedule_update()
+        self._display()
+        return True
 
-            if self.__reset.is_set():
-                self.__seconds = self.__default_time
-                self.__reset.clear()
 
-            # break out of loop if exit event is set while clock is running
-            if self.__exit.is_set():
-                self.__exit.clear()
-                break
-            self -= 1
-            self.string_var.set(str(self))
-            if self.__seconds == 0:
-                self._notify_clock_reached_zero()
-                break
-            sleep(1)
+    def _display(self):
+        """
+        Set the clock's text variable to the time on the clock, and
+        pass the text to the display observers.
+        """
+        text = str(self)
+        self.string_var.set(text)
+        for observer_func in self.display_observers:
+            observer_func(text)
 
 
     def _notify_clock_reached_zero(self):
@@ -70,38 +190,214 @@ class Clock():
         """
         Set the clock to zero
         """
-        self.__seconds = 0
-        self.__exit.set()
-        self.string_var.set(str(self))
+        with self.__lock:
+            self._stop(0, expired=True)
+        self._display()
         self._notify_clock_reached_zero()
 
 
     def reset(self):
         """
-        Reset the clock to the default time, and set the
-        exit event that will cause the clock run method
-        to stop.
+        Stop the clock and reset it to the default time.
         """
-        self.__seconds = self.__default_time
-        self.string_var.set(str(self))
-        self.__exit.set()
+        with self.__lock:
+            self._stop(self.__default_time)
+        self._display()
 
 
     def reset_while_running(self):
-        self.__reset.set()
+        """
+        Restart a running clock from the default time. Does nothing
+        if the clock is not running.
+        """
+        handle = self.__handle
+        if handle is not None:
+            self._restart(handle)
 
 
     def __str__(self):
         """
         String representation of a clock object
         """
-        return "{}:{}".format(self.__seconds//60,
-                (str)(self.__seconds%60).zfill(2))
+        seconds = self._get_time()
+        return "{}:{}".format(seconds//60, (str)(seconds%60).zfill(2))
 
 
     def __isub__(self, arg: int):
         """
         Magic method for decrementing clock seconds
         """
-        self.__seconds -= arg
+        with self.__lock:
+            if self.__deadline is None:
+                self.__seconds -= arg
+            else:
+                self.__deadline -= arg
+                self._schedule_update()
         return self
+
+
+class ClockHandle():
+    """
+    Handle for one run of a clock, returned by Clock.start.
+
+    The owner of a run (e.g. a game level) uses its handle to cancel
+    or restart it, or to wait for it to end. Once the clock has been
+    started again, or reset, an old handle no longer controls it.
+    """
+
+    def __init__(self, clock):
+        self.__clock = clock
+        self.__done = Event()
+        self.expired = False
+
+
+    def is_running(self):
+        """
+        Check if this run of the clock is still counting down.
+        """
+        return not self.__done.is_set()
+
+
+    def cancel(self):
+        """
+        Stop this run and reset the clock, without notifying the
+        observers. Return False if the run had already ended.
+        """
+        return self.__clock._cancel(self)
+
+
+    def restart(self):
+        """
+        Restart this run from the default time. Return False if the
+        run had already ended.
+        """
+        return self.__clock._restart(self)
+
+
+    def wait(self, timeout=None):
+        """
+        Wait until this run ends. Return False on timeout.
+        """
+        return self.__done.wait(timeout)
+
+
+    def _finish(self, expired):
+        """
+        Mark this run as ended; 'expired' if the clock reached zero.
+        """
+        self.expired = expired
+        self.__done.set()
+
+
+class Timer():
+    """
+    Handle for a callback scheduled on a TimerService.
+    """
+
+    __slots__ = ("when", "callback", "cancelled")
+
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+
+    def cancel(self):
+        """
+        Cancel the callback, if it has not run yet.
+        """
+        self.cancelled = True
+
+
+class TimerService():
+    """
+    Runs scheduled callbacks for any number of clocks from a single
+    daemon thread, started on first use. Pending callbacks are kept in
+    a heap ordered by their monotonic due time.
+    """
+
+    def __init__(self):
+        self.__heap = []
+        self.__sequence = itertools.count()
+        self.__condition = threading.Condition()
+        self.__thread = None
+
+
+    def schedule(self, when, callback):
+        """
+        Run 'callback' at monotonic time 'when'. Return a Timer that
+        can cancel it.
+        """
+        timer = Timer(when, callback)
+        with self.__condition:
+            heapq.heappush(self.__heap, (when, next(self.__sequence), timer))
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self._run,
+                        name="timer_service", daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+        return timer
+
+
+    def pending(self):
+        """
+        Number of scheduled callbacks that have not been cancelled.
+        """
+        with self.__condition:
+            return sum(not timer.cancelled for _, _, timer in self.__heap)
+
+
+    def _run(self):
+        """
+        Service thread: wait for the earliest callback to come due,
+        then run it.
+        """
+        while True:
+            with self.__condition:
+                while True:
+                    while self.__heap and self.__heap[0][2].cancelled:
+                        heapq.heappop(self.__heap)
+                    if not self.__heap:
+                        self.__condition.wait()
+                        continue
+                    delay = self.__heap[0][0] - monotonic()
+                    if delay <= 0:
+                        timer = heapq.heappop(self.__heap)[2]
+                        break
+                    self.__condition.wait(delay)
+
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback()
+            except Exception:
+                # report the error without stopping the service
+                threading.excepthook(threading.ExceptHookArgs(
+                    (*sys.exc_info(), threading.current_thread())))
+
+
+_timer_service = TimerService()
+
+def get_timer_service():
+    """
+    Get the process-wide timer service shared by all clocks.
+    """
+    return _timer_service
+
+
+class TextVariable():
+    """
+    Holds the text of a clock, with the get/set interface of tkinter's
+    StringVar.
+    """
+
+    def __init__(self, value=""):
+        self.__value = value
+
+
+    def get(self):
+        return self.__value
+
+
+    def set(self, value):
+        self.__value = value
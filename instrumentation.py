@@ -0,0 +1,157 @@
+"""
+instrumentation.py
+
+Opt-in timing instrumentation. Records the duration of named phases
+(e.g. loading a word list, choosing a base word, creating solution
+labels) and named counters (e.g. retries, lines scanned), and can log
+a summary line periodically.
+
+Instrumentation is off by default, and costs one attribute check per
+call while off. Turn it on with 'enable', or by setting the environment
+variable TEXTTWIST_INSTRUMENTATION to the log interval in seconds
+(0 for no periodic log line).
+"""
+
+import os
+import threading
+
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+enabled = False
+
+_lock = threading.Lock()
+_phases = {}        # phase name -> [count, total seconds, max seconds, last]
+_counters = {}      # counter name -> value
+_log_stop = None    # event that stops the periodic log thread
+
+_NO_PHASE = nullcontext()
+
+
+def enable(log_interval=None):
+    """
+    Start recording. If 'log_interval' is given, also log a summary
+    line every 'log_interval' seconds.
+    """
+    global enabled, _log_stop
+    enabled = True
+
+    if _log_stop is not None:
+        _log_stop.set()
+        _log_stop = None
+    if log_interval:
+        _log_stop = threading.Event()
+        threading.Thread(target=_log_periodically,
+                args=(log_interval, _log_stop),
+                name="instrumentation_log", daemon=True).start()
+
+
+def disable():
+    """
+    Stop recording and stop the periodic log line. Recorded values
+    are kept until 'reset'.
+    """
+    global enabled, _log_stop
+    enabled = False
+    if _log_stop is not None:
+        _log_stop.set()
+        _log_stop = None
+
+
+def reset():
+    """
+    Forget all recorded durations and counters.
+    """
+    with _lock:
+        _phases.clear()
+        _counters.clear()
+
+
+def phase(name):
+    """
+    Context manager that records the duration of the code it wraps
+    under the phase 'name'.
+    """
+    if not enabled:
+        return _NO_PHASE
+    return _timed_phase(name)
+
+
+@contextmanager
+def _timed_phase(name):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        record(name, perf_counter() - start)
+
+
+def record(name, seconds):
+    """
+    Record one occurrence of the phase 'name' lasting 'seconds'.
+    """
+    if not enabled:
+        return
+    with _lock:
+        stats = _phases.get(name)
+        if stats is None:
+            _phases[name] = [1, seconds, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] = seconds
+
+
+def count(name, amount=1):
+    """
+    Add 'amount' to the counter 'name'.
+    """
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def get_stats():
+    """
+    Get a snapshot of everything recorded so far: a dict with the
+    "phases" (count and total, mean, max and last duration in
+    milliseconds of each) and the "counters".
+    """
+    with _lock:
+        phases = {name: {
+                "count": n,
+                "total_ms": total * 1000,
+                "mean_ms": total / n * 1000,
+                "max_ms": longest * 1000,
+                "last_ms": last * 1000,
+            } for name, (n, total, longest, last) in _phases.items()}
+        return {"phases": phases, "counters": dict(_counters)}
+
+
+def format_stats():
+    """
+    Summarize the recorded values on one line.
+    """
+    stats = get_stats()
+    phases = " ".join(f"{name}={p['count']}x{p['mean_ms']:.2f}ms"
+            for name, p in sorted(stats["phases"].items()))
+    counters = " ".join(f"{name}={value}"
+            for name, value in sorted(stats["counters"].items()))
+    return f"phases: {phases or '-'} | counters: {counters or '-'}"
+
+
+def _log_periodically(interval, stop):
+    """
+    Log a summary line every 'interval' seconds until 'stop' is set.
+    """
+    # imported here, as most runs don't log
+    import logging
+    logger = logging.getLogger(__name__)
+    while not stop.wait(interval):
+        logger.info(format_stats())
+
+
+if os.environ.get("TEXTTWIST_INSTRUMENTATION"):
+    enable(float(os.environ["TEXTTWIST_INSTRUMENTATION"]))
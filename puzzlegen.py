@@ -0,0 +1,128 @@
+"""
+puzzlegen.py
+
+Batch puzzle generator. Generates puzzles (a base word and its full
+solution set) on all cores with a process pool, and streams them as
+JSON lines, e.g. to pre-fill the puzzle pools of game servers.
+
+Puzzle i of a run is generated from its own seed, derived from the run
+seed and i, so the output of a run does not depend on the number of
+workers.
+
+The dictionary is published once to a shared index file (see
+sharedindex.py), which every worker memory maps instead of loading
+its own copy of the word lists.
+
+Usage:
+    python puzzlegen.py COUNT [--seed SEED] [--workers N]
+        [--batch-size N] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from sharedindex import SharedWordDictionary, publish_word_dictionary
+from words import get_word_dictionary
+
+DEFAULT_BATCH_SIZE = 500
+
+# dictionary of a worker process, attached by 'attach_worker'
+_worker_dictionary = None
+
+
+def attach_worker(index_file):
+    """
+    Worker process initializer: attach to the shared dictionary index
+    'index_file'. If it is None (the index could not be published),
+    the worker loads its own copy of the dictionary instead.
+    """
+    global _worker_dictionary
+    if index_file is not None:
+        _worker_dictionary = SharedWordDictionary(index_file)
+
+
+def generate_puzzle(seed, index):
+    """
+    Generate puzzle 'index' of the run with seed 'seed'. Return a dict
+    with the index, the base word and its solution words.
+    """
+    dictionary = _worker_dictionary or get_word_dictionary()
+    random.seed(f"{seed}:{index}")
+    base_word = dictionary.random_base_word()
+    return {"index": index, "base_word": base_word,
+            "solutions": dictionary.solutions(base_word)}
+
+
+def generate_batch(seed, start, stop):
+    """
+    Generate puzzles 'start' to 'stop' - 1 of a run, in a worker
+    process. Return them as JSON lines, so that the parent process
+    only has to write them out.
+    """
+    return "".join(json.dumps(generate_puzzle(seed, index)) + "\n"
+            for index in range(start, stop))
+
+
+def generate_batches(count, seed=0, workers=None,
+        batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Generate 'count' puzzles in batches on a pool of 'workers'
+    processes (all cores by default). Yield each batch as JSON lines,
+    in order. Only a few batches per worker are in flight at a time,
+    so memory use does not grow with 'count'.
+    """
+    workers = workers or os.cpu_count()
+    batches = ((start, min(start + batch_size, count))
+            for start in range(0, count, batch_size))
+    index_file = publish_word_dictionary()
+    with ProcessPoolExecutor(max_workers=workers, initializer=attach_worker,
+            initargs=(index_file,)) as pool:
+        in_flight = deque()
+        for start, stop in batches:
+            in_flight.append(pool.submit(generate_batch, seed, start, stop))
+            if len(in_flight) >= 4 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def write_puzzles(count, output, seed=0, workers=None,
+        batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Write 'count' puzzles to the text stream 'output' as JSON lines.
+    Return the elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    for batch in generate_batches(count, seed, workers, batch_size):
+        output.write(batch)
+    output.flush()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate puzzles as "
+            "JSON lines")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        elapsed = write_puzzles(args.count, output, args.seed, args.workers,
+                args.batch_size)
+    finally:
+        if args.output:
+            output.close()
+
+    print(f"{args.count} puzzles in {elapsed:.2f} s with {args.workers} "
+            f"workers: {args.count / elapsed:.0f} puzzles/s", file=sys.stderr)
@@ -0,0 +1,85 @@
+"""
+rack.py
+
+Model of the letters of a text twist level: the rack, i.e. the
+puzzle letters that have not been typed yet, and the entry, i.e. the
+letters typed so far. The UI keeps its labels in sync with a Rack,
+so that it never has to read state back from its widgets.
+"""
+
+import random
+
+# text of an empty cell of the entry and of the rack
+ENTRY_BLANK = "_"
+RACK_BLANK = " "
+
+
+class Rack:
+    """
+    Rack and entry of a level
+
+    Both are lists of 'length' one-letter cells. Typing a letter moves
+    it from the first rack cell holding it to the end of the entry;
+    backspace moves the last entry letter back to the first empty
+    rack cell.
+    """
+
+    def __init__(self, length):
+        """
+        Create an empty rack and entry of 'length' cells each.
+        """
+        self.length = length
+        self.set_letters()
+
+
+    def set_letters(self, letters=None):
+        """
+        Put 'letters' on the rack in random order and clear the entry.
+        Without 'letters', the rack is empty.
+        """
+        self.letters = list(letters) if letters else [RACK_BLANK]*self.length
+        random.shuffle(self.letters)
+        self.entry = [ENTRY_BLANK] * self.length
+        self.__typed = 0
+
+
+    def shuffle(self):
+        """
+        Shuffle the letters on the rack.
+        """
+        random.shuffle(self.letters)
+
+
+    def type_letter(self, letter):
+        """
+        Move 'letter' from the rack to the end of the entry. Return
+        False if it is not on the rack.
+        """
+        if len(letter) != 1 or letter == RACK_BLANK or \
+            letter not in self.letters:
+            return False
+        self.letters[self.letters.index(letter)] = RACK_BLANK
+        self.entry[self.__typed] = letter
+        self.__typed += 1
+        return True
+
+
+    def backspace(self):
+        """
+        Move the last letter of the entry back to the rack. Return
+        False if the entry is empty.
+        """
+        if self.__typed == 0:
+            return False
+        self.__typed -= 1
+        letter = self.entry[self.__typed]
+        self.entry[self.__typed] = ENTRY_BLANK
+        self.letters[self.letters.index(RACK_BLANK)] = letter
+        return True
+
+
+    def word(self):
+        """
+        Get the word typed so far.
+        """
+        return "".join(self.entry[:self.__typed])
@@ -0,0 +1,365 @@
+"""
+server.py
+
+Headless text twist game server. Hosts any number of concurrent game
+sessions in one process over a newline-delimited JSON protocol on TCP.
+All sessions share one loaded WordDictionary.
+
+Requests (client -> server), one JSON object per line:
+    {"type": "start"}                       start a new session
+    {"type": "start", "session": id}        start the next level
+    {"type": "submit", "session": id, "word": "..."}
+    {"type": "state", "session": id}
+    {"type": "end", "session": id}
+
+Each request gets exactly one reply, in order: "started", "submitted",
+"state", "ended" or "error". When the clock of a level reaches zero, or
+all of its words have been found, the server pushes an "expired"
+message with the missing words.
+
+Usage:
+    python server.py serve [--host HOST] [--port PORT] [--game-time SECONDS]
+    python server.py loadtest [--host HOST] [--port PORT]
+        [--connections N] [--sessions N]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from clock import Clock
+from texttwistgame import GAME_TIME, TextTwistGame
+from words import get_word_dictionary
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+
+
+class HeadlessGame(TextTwistGame):
+    """
+    Text twist game for the server
+
+    Instead of running its clock on the timer service, the clock is
+    set to zero by a timer on the asyncio event loop, which notifies
+    the game's listeners as usual.
+    """
+
+    _expiry = None
+
+    def __init__(self, loop, game_time=GAME_TIME, dictionary=None):
+        """
+        Create a game whose clock runs on the event loop 'loop'.
+        """
+        self.loop = loop
+        self.game_time = game_time
+        self.deadline = None
+        super().__init__(dictionary, Clock(game_time), prefetch_first=False)
+
+
+    def run_clock(self):
+        """
+        Start the level timer on the event loop.
+        """
+        self._cancel_expiry()
+        self.deadline = self.loop.time() + self.game_time
+        self._expiry = self.loop.call_later(self.game_time,
+                self.clock.set_to_zero)
+
+
+    def reset_clock(self):
+        """
+        Stop the level timer and reset the game clock.
+        """
+        self._cancel_expiry()
+        self.deadline = None
+        self.clock.reset()
+
+
+    def notify_clock_reached_zero(self):
+        """
+        Stop the level timer and notify all listeners that the clock
+        reached zero.
+        """
+        self._cancel_expiry()
+        self.deadline = None
+        super().notify_clock_reached_zero()
+
+
+    def is_running(self):
+        """
+        Check if the current level is still being played.
+        """
+        return self.deadline is not None
+
+
+    def remaining_time(self):
+        """
+        Seconds left in the current level.
+        """
+        if self.deadline is None:
+            return 0
+        return max(0.0, self.deadline - self.loop.time())
+
+
+    def _cancel_expiry(self):
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+
+
+class GameServer:
+    """
+    Asyncio game server
+
+    Owns all game sessions. Each session belongs to the connection that
+    started it, and is ended when that connection closes.
+    """
+
+    def __init__(self, game_time=GAME_TIME, dictionary=None):
+        """
+        Create a server whose levels last 'game_time' seconds.
+        """
+        self.game_time = game_time
+        self.dictionary = dictionary or get_word_dictionary()
+        self.sessions = {}
+        self.__session_ids = itertools.count(1)
+
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Start listening. Return the asyncio server object.
+        """
+        # load the shared dictionary before the first client arrives
+        await asyncio.get_running_loop().run_in_executor(None,
+                self.dictionary.random_base_word)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve one client connection until it closes.
+        """
+        owned = set()
+        try:
+            while True:
+                try:
+                    line = await read_line(reader)
+                    if not line:
+                        break
+                    request = json.loads(line)
+                    reply = self.handle_request(request, writer, owned)
+                except (ValueError, TypeError, KeyError) as error:
+                    reply = {"type": "error", "message": str(error)}
+                send(writer, reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in owned:
+                self.end_session(session_id)
+            writer.close()
+
+
+    def handle_request(self, request, writer, owned):
+        """
+        Handle one request from a client. Return the reply.
+        """
+        kind = request["type"]
+        if kind == "start" and "session" not in request:
+            session_id = self.new_session(writer)
+            owned.add(session_id)
+            return self.start_level(session_id)
+
+        session_id = request["session"]
+        if session_id not in owned:
+            raise KeyError(f"unknown session {session_id}")
+        game = self.sessions[session_id]
+
+        if kind == "start":
+            if game.is_running() or not game.level_passed():
+                raise ValueError("level not passed")
+            return self.start_level(session_id)
+        elif kind == "submit":
+            word = str(request["word"]).upper()
+            accepted = game.is_running() and game.word_entry_is_valid(word)
+            return {"type": "submitted", "session": session_id,
+                    "word": word, "accepted": accepted,
+                    "score": game.get_score(),
+                    "level_passed": game.level_passed()}
+        elif kind == "state":
+            return {"type": "state", "session": session_id,
+                    "letters": "".join(game.get_letters()),
+                    "score": game.get_score(),
+                    "words": len(game.get_wordlist()),
+                    "found": sorted(game.get_entered_words()),
+                    "remaining": round(game.remaining_time(), 3),
+                    "active": game.is_running(),
+                    "level_passed": game.level_passed()}
+        elif kind == "end":
+            owned.discard(session_id)
+            self.end_session(session_id)
+            return {"type": "ended", "session": session_id}
+        else:
+            raise ValueError(f"unknown request type '{kind}'")
+
+
+    def new_session(self, writer):
+        """
+        Create a game session whose pushes go to 'writer'. Return
+        its id.
+        """
+        session_id = next(self.__session_ids)
+        game = HeadlessGame(asyncio.get_running_loop(), self.game_time,
+                self.dictionary)
+        game.add_ui_callback("push_expired",
+                lambda: send(writer, {"type": "expired",
+                    "session": session_id,
+                    "missing": sorted(game.get_missing_solution_words()),
+                    "score": game.get_score(),
+                    "level_passed": game.level_passed()}))
+        self.sessions[session_id] = game
+        return session_id
+
+
+    def start_level(self, session_id):
+        """
+        Start a level of a session. Return the "started" reply.
+        """
+        game = self.sessions[session_id]
+        game.start_game()
+        letters = game.get_letters()
+        return {"type": "started", "session": session_id,
+                "letters": "".join(random.sample(letters, len(letters))),
+                "words": len(game.get_wordlist()),
+                "time": self.game_time}
+
+
+    def end_session(self, session_id):
+        """
+        Stop a session's clock and forget it.
+        """
+        game = self.sessions.pop(session_id, None)
+        if game is not None:
+            game.ui_callbacks.clear()
+            game.cancel_prefetch()
+            game.reset_clock()
+
+
+def send(writer, message):
+    """
+    Queue one message on a connection.
+    """
+    if not writer.is_closing():
+        writer.write(json.dumps(message).encode() + b"\n")
+
+
+async def read_line(reader):
+    """
+    Read one line from 'reader', or b"" at the end of the stream. A
+    line over the stream limit is skipped, and raises a ValueError.
+    """
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as error:
+        return error.partial
+    except asyncio.LimitOverrunError as error:
+        overrun = error
+
+    while overrun is not None:
+        await reader.readexactly(overrun.consumed)
+        try:
+            await reader.readuntil(b"\n")
+            overrun = None
+        except asyncio.IncompleteReadError:
+            overrun = None
+        except asyncio.LimitOverrunError as error:
+            overrun = error
+    raise ValueError("line too long")
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, game_time=GAME_TIME):
+    """
+    Run a game server until cancelled.
+    """
+    server = await GameServer(game_time).start(host, port)
+    print(f"Serving on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def request(reader, writer, message):
+    """
+    Send a request and wait for its reply, skipping pushed messages.
+    """
+    send(writer, message)
+    await writer.drain()
+    while True:
+        reply = json.loads(await reader.readline())
+        if reply["type"] != "expired":
+            return reply
+
+
+async def play_sessions(host, port, num_sessions, submit_latencies):
+    """
+    Load-test client for one connection: play 'num_sessions' sessions,
+    submitting every solution word of each level and recording the
+    latency of each submission.
+    """
+    dictionary = get_word_dictionary()
+    reader, writer = await asyncio.open_connection(host, port)
+    for _ in range(num_sessions):
+        started = await request(reader, writer, {"type": "start"})
+        session_id = started["session"]
+        for word in dictionary.solutions(started["letters"]):
+            start = time.perf_counter()
+            await request(reader, writer, {"type": "submit",
+                "session": session_id, "word": word})
+            submit_latencies.append(time.perf_counter() - start)
+        await request(reader, writer, {"type": "end", "session": session_id})
+    writer.close()
+    await writer.wait_closed()
+
+
+async def load_test(host=DEFAULT_HOST, port=DEFAULT_PORT, connections=100,
+        sessions=10):
+    """
+    Play 'sessions' sessions on each of 'connections' concurrent
+    connections. Report sessions per second and submit latencies.
+    """
+    submit_latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(play_sessions(host, port, sessions,
+        submit_latencies) for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    total = connections * sessions
+    print(f"{total} sessions in {elapsed:.2f} s: "
+            f"{total / elapsed:.0f} sessions/s")
+    if not submit_latencies:
+        print("0 submits")
+        return
+    submit_latencies.sort()
+    p50 = submit_latencies[len(submit_latencies) // 2]
+    p99 = submit_latencies[int(len(submit_latencies) * 0.99)]
+    print(f"{len(submit_latencies)} submits: p50 {p50*1000:.2f} ms, "
+            f"p99 {p99*1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Text twist game server")
+    parser.add_argument("command", choices=["serve", "loadtest"])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--game-time", type=float, default=GAME_TIME)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(serve(args.host, args.port, args.game_time))
+    else:
+        asyncio.run(load_test(args.host, args.port, args.connections,
+            args.sessions))
@@ -0,0 +1,312 @@
+"""
+sharedindex.py
+
+Read-only dictionary index shared by worker processes. A
+WordDictionary is published once to a flat binary index file next to
+its word list: the words, the signature index as an open addressing
+hash table, and the base words that qualify for puzzles. Each process
+memory maps the file and reads it in place, so the index is stored
+once in the page cache however many workers attach to it, instead of
+being unpickled into every worker.
+
+Offsets and positions are native-endian unsigned ints, so an index
+file is only read on the machine that wrote it.
+"""
+
+import hashlib
+import mmap
+import os
+import random
+import struct
+import tempfile
+import zlib
+
+from array import array
+
+from words import *
+
+SHARED_INDEX_SUFFIX = ".shared"
+SHARED_INDEX_MAGIC = b"TTSHIDX1"
+SHARED_INDEX_FORMAT_VERSION = 1
+
+# the sections of an index file, in order
+SECTIONS = ("word_offsets", "words", "signature_offsets", "signatures",
+        "posting_offsets", "postings", "table", "base_offsets", "base_words")
+
+# magic, version, rack length, min word length, min solutions, digest of
+# the sources, then the byte offset and size of each section. Sections
+# start at multiples of 8 bytes.
+_HEADER = struct.Struct(f"=8sIIII32s{2 * len(SECTIONS)}Q")
+
+
+class SharedWordDictionary:
+    """
+    Word lists for text twist puzzles, read from a shared index file
+
+    Has the interface of WordDictionary that games and the puzzle
+    generator use, and gives the same results as the dictionary the
+    index was published from. Base words are drawn uniformly from the
+    qualifying base words, as with a puzzle catalog.
+    """
+
+    def __init__(self, index_file, cache_size=SOLUTION_CACHE_SIZE):
+        """
+        Attach to the published index 'index_file'. The solutions of up
+        to 'cache_size' racks are cached.
+        """
+        self.index_file = index_file
+        self.solution_cache = LRUCache(cache_size)
+        with open(index_file, "rb") as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.rack_length, self.min_word_length, \
+            self.min_solutions, self.digest, *layout = \
+            _HEADER.unpack_from(self.__map)
+        if magic != SHARED_INDEX_MAGIC or \
+            version != SHARED_INDEX_FORMAT_VERSION:
+            raise ValueError(f"'{index_file}' is not a shared word index.")
+
+        view = memoryview(self.__map)
+        sections = {name: view[start:start + size] for name, start, size in
+                zip(SECTIONS, layout[0::2], layout[1::2])}
+        self.__word_offsets = sections["word_offsets"].cast("I")
+        self.__words = sections["words"]
+        self.__signature_offsets = sections["signature_offsets"].cast("I")
+        self.__signatures = sections["signatures"]
+        self.__posting_offsets = sections["posting_offsets"].cast("I")
+        self.__postings = sections["postings"].cast("I")
+        self.__table = sections["table"].cast("I")
+        self.__base_offsets = sections["base_offsets"].cast("I")
+        self.__base_words = sections["base_words"]
+
+
+    def __len__(self):
+        return len(self.__word_offsets) - 1
+
+
+    def generation(self):
+        """
+        Get the generation of the words, as WordDictionary.generation.
+        Always 0, as an attached index never changes.
+        """
+        return 0
+
+
+    def word(self, i):
+        """
+        Get the word at position 'i' of the dictionary.
+        """
+        offsets = self.__word_offsets
+        return str(self.__words[offsets[i]:offsets[i + 1]], "utf-8")
+
+
+    def random_base_word(self, rng=random):
+        """
+        Choose a random base word with enough solution words, drawing
+        from 'rng' (the global random state by default).
+        """
+        offsets = self.__base_offsets
+        i = rng.randrange(len(offsets) - 1)
+        return str(self.__base_words[offsets[i]:offsets[i + 1]], "utf-8")
+
+
+    def solutions(self, rack):
+        """
+        Get a list of all words in the dictionary that can be made from
+        the letters in 'rack', in dictionary file order.
+        """
+        return [self.word(i) for i in self._get_solution_positions(rack)]
+
+
+    def solution_positions(self, rack):
+        """
+        Get the sorted positions in the dictionary of all words that
+        can be made from the letters in 'rack'.
+        """
+        return list(self._get_solution_positions(rack))
+
+
+    def _get_solution_positions(self, rack):
+        """
+        Get the sorted positions of the solutions of 'rack' as a tuple,
+        from the solution cache if possible.
+        """
+        signature = get_signature(rack)
+        positions = self.solution_cache.get(signature)
+        if positions is not None:
+            return positions
+
+        positions = []
+        offsets = self.__posting_offsets
+        for sub_signature in get_sub_signatures(rack, self.min_word_length):
+            i = self._find_signature(sub_signature.encode("utf-8"))
+            if i >= 0:
+                positions.extend(self.__postings[offsets[i]:offsets[i + 1]])
+        positions = tuple(sorted(positions))
+        self.solution_cache.put(signature, positions)
+        return positions
+
+
+    def contains(self, word):
+        """
+        Check if 'word' is in the dictionary.
+        """
+        i = self._find_signature(get_signature(word).encode("utf-8"))
+        if i < 0:
+            return False
+        offsets = self.__posting_offsets
+        return any(self.word(position) == word for position in
+                self.__postings[offsets[i]:offsets[i + 1]])
+
+
+    def _find_signature(self, signature):
+        """
+        Get the number of the signature 'signature' (bytes) in the
+        index, or -1 if no dictionary word has it.
+        """
+        table = self.__table
+        mask = len(table) - 1
+        offsets = self.__signature_offsets
+        slot = zlib.crc32(signature) & mask
+        while table[slot]:
+            i = table[slot] - 1
+            if self.__signatures[offsets[i]:offsets[i + 1]] == signature:
+                return i
+            slot = (slot + 1) & mask
+        return -1
+
+
+def get_shared_index_file(dictionary):
+    """
+    Get the name of the index file of a WordDictionary, next to its
+    dictionary file. The name includes the rack length and a hash of
+    the dictionary's other files and settings, so dictionaries of the
+    same word list that draw different base words get their own index
+    files.
+    """
+    settings = (os.path.abspath(dictionary.filename),
+            dictionary.base_word_file, dictionary.catalog_file,
+            dictionary.min_word_length, dictionary.min_solutions)
+    key = hashlib.sha256(repr(settings).encode()).hexdigest()[:12]
+    return f"{dictionary.filename}.{dictionary.rack_length}.{key}" \
+        f"{SHARED_INDEX_SUFFIX}"
+
+
+def get_source_digest(dictionary):
+    """
+    Get a digest of the settings of a WordDictionary and of the size
+    and modification time of its files, which changes whenever its
+    index has to be rebuilt.
+    """
+    sources = [dictionary.rack_length, dictionary.min_word_length,
+            dictionary.min_solutions]
+    for filename in (dictionary.filename, dictionary.base_word_file,
+            dictionary.catalog_file):
+        sources.append(filename and get_file_stat(filename))
+    return hashlib.sha256(repr(sources).encode()).digest()
+
+
+def publish_word_dictionary(dictionary=None, index_file=None):
+    """
+    Publish a WordDictionary (the default one if not given) to its
+    shared index file, unless the file is already up to date. If it
+    can't be written (e.g. in a read-only directory), the index is
+    published to the temporary directory instead. Return the name of
+    the index file, for worker processes to attach to, or None if it
+    can't be written anywhere.
+    """
+    dictionary = dictionary or get_word_dictionary()
+    index_file = index_file or get_shared_index_file(dictionary)
+    digest = get_source_digest(dictionary)
+
+    for candidate in (index_file, os.path.join(tempfile.gettempdir(),
+        os.path.basename(index_file))):
+        if is_published(candidate, digest):
+            return candidate
+        try:
+            write_shared_index(dictionary, candidate, digest)
+            return candidate
+        except OSError:
+            pass
+    return None
+
+
+def is_published(index_file, digest):
+    """
+    Check if 'index_file' is a shared index published from sources
+    with the digest 'digest'.
+    """
+    try:
+        with open(index_file, "rb") as f:
+            magic, version, *_, published_digest = \
+                _HEADER.unpack(f.read(_HEADER.size))[:6]
+    except (OSError, struct.error):
+        return False
+    return (magic, version, published_digest) == (SHARED_INDEX_MAGIC,
+            SHARED_INDEX_FORMAT_VERSION, digest)
+
+
+def write_shared_index(dictionary, index_file, digest):
+    """
+    Write the index file of a WordDictionary. The file is replaced
+    atomically, so workers never attach to a partial file.
+    """
+    word_list, signature_index = dictionary._get_words()
+    signatures = list(signature_index)
+
+    table = array("I", [0]) * max(8, 1 << (2 * len(signatures)).bit_length())
+    mask = len(table) - 1
+    for i, signature in enumerate(signatures):
+        slot = zlib.crc32(signature.encode("utf-8")) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = i + 1
+
+    postings = array("I")
+    posting_offsets = array("I", [0])
+    for signature in signatures:
+        postings.extend(signature_index[signature])
+        posting_offsets.append(len(postings))
+
+    word_offsets, words = pack_strings(word_list)
+    signature_offsets, packed_signatures = pack_strings(signatures)
+    base_offsets, base_words = pack_strings(
+            dictionary.qualifying_base_words())
+
+    sections = [word_offsets.tobytes(), words,
+            signature_offsets.tobytes(), packed_signatures,
+            posting_offsets.tobytes(), postings.tobytes(), table.tobytes(),
+            base_offsets.tobytes(), base_words]
+    layout = []
+    start = _HEADER.size
+    for section in sections:
+        start = (start + 7) & ~7
+        layout += [start, len(section)]
+        start += len(section)
+
+    temp_file = f"{index_file}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, "wb") as f:
+            f.write(_HEADER.pack(SHARED_INDEX_MAGIC,
+                SHARED_INDEX_FORMAT_VERSION, dictionary.rack_length,
+                dictionary.min_word_length, dictionary.min_solutions, digest,
+                *layout))
+            for start, section in zip(layout[0::2], sections):
+                f.write(bytes(start - f.tell()))
+                f.write(section)
+        os.replace(temp_file, index_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def pack_strings(strings):
+    """
+    Pack a list of strings into an array of the offsets of each string
+    and of the end, and the UTF-8 bytes of all strings joined.
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = array("I", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    return offsets, b"".join(encoded)
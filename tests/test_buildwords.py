@@ -0,0 +1,40 @@
+import filecmp
+import tempfile
+import unittest
+import sys, os
+
+sys.path.insert(0, os.path.abspath('..'))
+from buildwords import *
+from words import load_puzzle_catalog
+
+
+class BuildWordsTest(unittest.TestCase):
+
+    def test_clean_words(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source_file = os.path.join(directory, "source")
+            with open(source_file, "w", encoding="utf-8") as source:
+                source.write("Aaron\ncat\ncat's\n\n  dog \ncafé\nx-ray\n"
+                        "ox\ncat\nDog\nabandoning\nabandonment\n")
+
+            self.assertEqual(list(clean_words(source_file)),
+                    ["CAT", "DOG", "ABANDONING"])
+
+    def test_build_reproduces_word_lists(self):
+        with tempfile.TemporaryDirectory() as directory:
+            counts = build_word_lists(ORIGINAL_WORD_FILE, directory)
+
+            for path in counts:
+                name = os.path.basename(path)
+                self.assertTrue(filecmp.cmp(path,
+                    os.path.join(WORDLIST_DIR, name), shallow=False), name)
+                self.assertTrue(os.path.exists(path + COMPILED_FILE_SUFFIX))
+
+            catalog_file = os.path.join(directory,
+                    os.path.basename(PUZZLE_CATALOG_FILE))
+            self.assertEqual(load_puzzle_catalog(catalog_file),
+                    load_puzzle_catalog())
+
+
+if __name__ == "__main__":
+    unittest.main()
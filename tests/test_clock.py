@@ -1,7 +1,7 @@
 import sys
 import os
 import unittest
-import tkinter as tk
+import threading
 import time
 
 from threading import Thread
@@ -9,13 +9,12 @@ from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, os.path.abspath('..'))
 
-from clock import Clock
+from clock import Clock, TextVariable, TimerService
 from texttwistgame import TextTwistGame
 
 class TestClock(unittest.TestCase):
 
     def setUp(self):
-        self.root = tk.Tk()
         self.clock = Clock()
 
     def test_clock_default_time(self):
@@ -53,8 +52,83 @@ class TestClock(unittest.TestCase):
         self.clock -= 1
         self.assertEqual(self.clock._get_time(), 9)
 
-    def tearDown(self):
-        self.root.destroy()
+
+class TestDeadlineClock(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock(2, string_var=TextVariable())
+
+    def test_start_and_expire(self):
+        mock = MagicMock()
+        self.clock.observers.add(mock)
+
+        start = time.monotonic()
+        self.clock.run()
+
+        self.assertAlmostEqual(time.monotonic() - start, 2, delta=0.2)
+        self.assertEqual(self.clock.string_var.get(), "0:00")
+        self.assertFalse(self.clock.is_running())
+        mock.assert_called_once()
+
+    def test_display_observers(self):
+        texts = []
+        self.clock.display_observers.add(texts.append)
+
+        self.clock.start()
+        self.clock.reset()
+        self.clock.set_to_zero()
+
+        self.assertEqual(texts, ["0:02", "0:02", "0:00"])
+
+    def test_reset_takes_effect_immediately(self):
+        mock = MagicMock()
+        self.clock.observers.add(mock)
+
+        self.clock.start()
+        self.clock -= 1
+        self.assertEqual(self.clock._get_time(), 1)
+        self.clock.reset_while_running()
+        self.assertEqual(self.clock._get_time(), 2)
+        self.clock.reset()
+        self.assertFalse(self.clock.is_running())
+
+        time.sleep(2.2)
+        self.assertEqual(str(self.clock), "0:02")
+        mock.assert_not_called()
+
+    def test_clock_handle(self):
+        first = self.clock.start()
+        second = self.clock.start()
+
+        self.assertFalse(first.is_running())
+        self.assertFalse(first.cancel())
+        self.assertFalse(first.restart())
+        self.assertTrue(self.clock.is_running())
+
+        self.assertTrue(second.restart())
+        self.assertTrue(second.cancel())
+        self.assertFalse(self.clock.is_running())
+        self.assertTrue(second.wait(0))
+        self.assertFalse(second.expired)
+
+        third = self.clock.start()
+        self.clock.set_to_zero()
+        self.assertTrue(third.expired)
+
+    def test_shared_timer_service(self):
+        service = TimerService()
+        mock = MagicMock()
+        clocks = [Clock(1, TextVariable(), service) for _ in range(200)]
+        for clock in clocks:
+            clock.observers.add(mock)
+            clock.start()
+        threads = threading.active_count()
+
+        time.sleep(1.3)
+
+        self.assertEqual(mock.call_count, len(clocks))
+        self.assertEqual(service.pending(), 0)
+        self.assertEqual(threading.active_count(), threads)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,82 @@
+import unittest
+import sys, os
+
+sys.path.insert(0, os.path.abspath('..'))
+import instrumentation
+from clock import Clock, TextVariable
+from texttwistgame import TextTwistGame, get_shared_puzzle
+from words import WordDictionary
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    def setUp(self):
+        instrumentation.reset()
+
+    def test_start_game_phases(self):
+        instrumentation.enable()
+        try:
+            game = TextTwistGame(WordDictionary(),
+                    Clock(120, string_var=TextVariable()))
+            game.start_game()
+        finally:
+            instrumentation.disable()
+            game.reset_clock()
+
+        # the puzzle may have been prefetched in the background
+        stats = instrumentation.get_stats()
+        self.assertEqual(stats["phases"]["game.start_game"]["count"], 1)
+        for name in ("words.choose_base_word", "words.solutions"):
+            self.assertGreaterEqual(stats["phases"][name]["count"], 1)
+        # the word list and the base word list are each validated once
+        self.assertEqual(stats["phases"]["words.validate_file_name"]["count"],
+                2)
+        self.assertGreater(stats["counters"]["words.candidates_tested"], 0)
+        self.assertIn("game.start_game=1x", instrumentation.format_stats())
+
+    def test_disabled(self):
+        with instrumentation.phase("test"):
+            instrumentation.count("test")
+
+        self.assertEqual(instrumentation.get_stats(),
+                {"phases": {}, "counters": {}})
+
+    def test_counters_and_reset(self):
+        instrumentation.enable()
+        try:
+            instrumentation.count("test", 2)
+            instrumentation.count("test")
+            instrumentation.record("phase", 0.5)
+            instrumentation.record("phase", 1.5)
+        finally:
+            instrumentation.disable()
+
+        stats = instrumentation.get_stats()
+        self.assertEqual(stats["counters"], {"test": 3})
+        self.assertEqual(stats["phases"]["phase"]["count"], 2)
+        self.assertAlmostEqual(stats["phases"]["phase"]["mean_ms"], 1000)
+        self.assertAlmostEqual(stats["phases"]["phase"]["max_ms"], 1500)
+
+        instrumentation.reset()
+        self.assertEqual(instrumentation.get_stats()["counters"], {})
+
+    def test_cache_counters(self):
+        dictionary = WordDictionary()
+        instrumentation.enable()
+        try:
+            for _ in range(2):
+                get_shared_puzzle(dictionary, "SWORDS")
+        finally:
+            instrumentation.disable()
+
+        # solution cache and puzzle cache lookups are counted apart, and
+        # a puzzle cache hit doesn't look up the solutions
+        counters = instrumentation.get_stats()["counters"]
+        self.assertEqual((counters["game.puzzle_cache_misses"],
+            counters["game.puzzle_cache_hits"]), (1, 1))
+        self.assertEqual((counters["words.cache_misses"],
+            counters.get("words.cache_hits", 0)), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import io
+import json
+import unittest
+import sys, os
+
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath('..'))
+from puzzlegen import generate_batch, generate_batches, write_puzzles
+from words import MIN_SOLUTION_SET_SIZE, get_words_from_base_word
+
+
+class PuzzleGenTest(unittest.TestCase):
+
+    def test_batch_is_reproducible(self):
+        batch = generate_batch(7, 0, 20)
+
+        self.assertEqual(batch, generate_batch(7, 0, 20))
+        self.assertNotEqual(batch, generate_batch(8, 0, 20))
+
+        puzzles = [json.loads(line) for line in batch.splitlines()]
+        self.assertEqual([p["index"] for p in puzzles], list(range(20)))
+        for puzzle in puzzles:
+            self.assertGreaterEqual(len(puzzle["solutions"]),
+                    MIN_SOLUTION_SET_SIZE)
+            self.assertEqual(puzzle["solutions"],
+                    get_words_from_base_word(puzzle["base_word"]))
+
+    def test_output_independent_of_workers(self):
+        expected = generate_batch(3, 0, 45)
+
+        self.assertEqual("".join(generate_batches(45, 3, workers=2,
+            batch_size=10)), expected)
+
+        output = io.StringIO()
+        write_puzzles(45, output, 3, workers=1, batch_size=7)
+        self.assertEqual(output.getvalue(), expected)
+
+    def test_without_shared_index(self):
+        # the index could not be published: workers load the dictionary
+        with patch("puzzlegen.publish_word_dictionary", return_value=None):
+            self.assertEqual("".join(generate_batches(10, 3, workers=1,
+                batch_size=5)), generate_batch(3, 0, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys, os
+
+sys.path.insert(0, os.path.abspath('..'))
+from rack import ENTRY_BLANK, RACK_BLANK, Rack
+
+
+class RackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rack = Rack(6)
+        self.rack.set_letters("SWORDS")
+
+    def test_set_letters(self):
+        self.assertEqual(sorted(self.rack.letters), sorted("SWORDS"))
+        self.assertEqual(self.rack.entry, [ENTRY_BLANK] * 6)
+
+        self.rack.set_letters()
+        self.assertEqual(self.rack.letters, [RACK_BLANK] * 6)
+
+    def test_type_letter(self):
+        for letter in "SOS":
+            self.assertTrue(self.rack.type_letter(letter))
+        self.assertFalse(self.rack.type_letter("S"))
+        self.assertFalse(self.rack.type_letter("Q"))
+        self.assertFalse(self.rack.type_letter(RACK_BLANK))
+        self.assertFalse(self.rack.type_letter(""))
+
+        self.assertEqual(self.rack.word(), "SOS")
+        self.assertEqual(self.rack.entry, list("SOS") + [ENTRY_BLANK] * 3)
+        self.assertEqual(self.rack.letters.count(RACK_BLANK), 3)
+        self.assertEqual(sorted(self.rack.letters), sorted("   WRD"))
+
+    def test_backspace(self):
+        self.assertFalse(self.rack.backspace())
+        for letter in "WORDS":
+            self.rack.type_letter(letter)
+
+        self.assertTrue(self.rack.backspace())
+        self.assertEqual(self.rack.word(), "WORD")
+        self.assertEqual(sorted(self.rack.letters), sorted("    SS"))
+
+        while self.rack.backspace():
+            pass
+        self.assertEqual(self.rack.word(), "")
+        self.assertEqual(sorted(self.rack.letters), sorted("SWORDS"))
+        self.assertEqual(self.rack.entry, [ENTRY_BLANK] * 6)
+
+    def test_shuffle(self):
+        self.rack.type_letter("W")
+        self.rack.shuffle()
+
+        self.assertEqual(sorted(self.rack.letters), sorted(" SORDS"))
+        self.assertEqual(self.rack.word(), "W")
+
+
+if __name__ == "__main__":
+    unittest.main()
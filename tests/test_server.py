@@ -0,0 +1,79 @@
+import asyncio
+import json
+import unittest
+import sys, os
+
+sys.path.insert(0, os.path.abspath('..'))
+from server import GameServer, load_test, request, send
+from words import get_words_from_base_word
+
+
+class ServerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = await GameServer(game_time=0.5).start(port=0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.reader, self.writer = await asyncio.open_connection(
+                "127.0.0.1", port)
+
+    async def test_session(self):
+        started = await request(self.reader, self.writer, {"type": "start"})
+        session_id = started["session"]
+        solutions = get_words_from_base_word(started["letters"])
+        self.assertEqual(started["words"], len(solutions))
+
+        submitted = await request(self.reader, self.writer, {"type": "submit",
+            "session": session_id, "word": solutions[0].lower()})
+        self.assertTrue(submitted["accepted"])
+        self.assertEqual(submitted["score"], len(solutions[0]))
+
+        submitted = await request(self.reader, self.writer, {"type": "submit",
+            "session": session_id, "word": solutions[0]})
+        self.assertFalse(submitted["accepted"])
+
+        state = await request(self.reader, self.writer,
+                {"type": "state", "session": session_id})
+        self.assertTrue(state["active"])
+        self.assertEqual(state["found"], [solutions[0]])
+
+        expired = json.loads(await self.reader.readline())
+        self.assertEqual(expired["type"], "expired")
+        self.assertEqual(expired["missing"], sorted(solutions[1:]))
+
+        state = await request(self.reader, self.writer,
+                {"type": "state", "session": session_id})
+        self.assertFalse(state["active"])
+
+    async def test_errors(self):
+        reply = await request(self.reader, self.writer,
+                {"type": "state", "session": 12345})
+        self.assertEqual(reply["type"], "error")
+
+        send(self.writer, {"type": "nonsense"})
+        self.writer.write(b"not json\n")
+        for _ in range(2):
+            reply = json.loads(await self.reader.readline())
+            self.assertEqual(reply["type"], "error")
+
+    async def test_line_over_limit(self):
+        self.writer.write(b"x" * (2 ** 17) + b"\n")
+        reply = json.loads(await self.reader.readline())
+        self.assertEqual(reply["type"], "error")
+
+        # the connection is still served
+        started = await request(self.reader, self.writer, {"type": "start"})
+        self.assertEqual(started["type"], "started")
+
+    async def test_load_test_without_submits(self):
+        port = self.server.sockets[0].getsockname()[1]
+        await load_test(port=port, connections=1, sessions=0)
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.server.close()
+        await self.server.wait_closed()
+
+
+if __name__ == "__main__":
+    unittest.main()
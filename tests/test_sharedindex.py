@@ -0,0 +1,173 @@
+import multiprocessing
+import random
+import tempfile
+import unittest
+import sys, os
+
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath('..'))
+import sharedindex
+from sharedindex import *
+from words import *
+
+SMAPS_ROLLUP = "/proc/self/smaps_rollup"
+NUM_SOLVED_RACKS = 200
+
+
+def get_private_dirty():
+    """
+    Get the private dirty memory of this process in KiB, i.e. the
+    memory no other process shares with it.
+    """
+    with open(SMAPS_ROLLUP) as f:
+        for line in f:
+            if line.startswith("Private_Dirty:"):
+                return int(line.split()[1])
+
+
+def solve_in_worker(index_file):
+    """
+    Attach to a dictionary in a fresh worker and solve some racks.
+    Return the growth of the worker's private memory in KiB. Loads the
+    compiled word lists if 'index_file' is None.
+    """
+    before = get_private_dirty()
+    if index_file:
+        dictionary = SharedWordDictionary(index_file)
+    else:
+        dictionary = WordDictionary()
+    random.seed(0)
+    for _ in range(NUM_SOLVED_RACKS):
+        dictionary.solutions(dictionary.random_base_word())
+    return get_private_dirty() - before
+
+
+class SharedWordDictionaryTest(unittest.TestCase):
+
+    def test_same_results_as_word_dictionary(self):
+        for dictionary in (get_word_dictionary(), get_rack_dictionary(8)):
+            shared = SharedWordDictionary(publish_word_dictionary(dictionary))
+            racks = [shared.random_base_word() for _ in range(50)]
+            self.assertLessEqual(set(racks),
+                    set(dictionary.qualifying_base_words()))
+            for rack in racks:
+                self.assertEqual(shared.solutions(rack),
+                        dictionary.solutions(rack))
+                self.assertEqual(shared.solution_positions(rack),
+                        dictionary.solution_positions(rack))
+
+            # racks in any letter order share a cache entry
+            shared.solution_cache.clear()
+            shared.solutions(racks[0])
+            hits = shared.solution_cache.hits
+            self.assertEqual(shared.solutions(racks[0][::-1]),
+                    dictionary.solutions(racks[0]))
+            self.assertEqual(shared.solution_cache.hits, hits + 1)
+
+            for word in ("swords", "sword", "drows", "zzzzzz", "a"):
+                self.assertEqual(shared.contains(word),
+                        dictionary.contains(word))
+
+    def test_same_base_words_as_catalog(self):
+        dictionary = get_word_dictionary()
+        shared = SharedWordDictionary(publish_word_dictionary(dictionary))
+        random.seed(0)
+        base_words = [dictionary.random_base_word() for _ in range(50)]
+        random.seed(0)
+        self.assertEqual([shared.random_base_word() for _ in range(50)],
+                base_words)
+
+    def test_publish_rebuilds_only_stale_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "words.txt")
+            with open(filename, "w") as f:
+                f.write("\n".join(["words", "sword", "rows", "drows",
+                    "swords"]) + "\n")
+            dictionary = WordDictionary(filename, min_solutions=1)
+            index_file = os.path.join(directory, "words.shared")
+
+            publish_word_dictionary(dictionary, index_file)
+            mtime = os.stat(index_file).st_mtime_ns
+            publish_word_dictionary(dictionary, index_file)
+            self.assertEqual(os.stat(index_file).st_mtime_ns, mtime)
+            self.assertEqual(SharedWordDictionary(index_file)
+                    .solutions("swords"), ["words", "sword", "rows", "drows",
+                        "swords"])
+
+            with open(filename, "a") as f:
+                f.write("dross\n")
+            os.utime(filename, ns=(mtime + 10**9, mtime + 10**9))
+            forget_word_file(filename)
+            dictionary = WordDictionary(filename, min_solutions=1)
+            publish_word_dictionary(dictionary, index_file)
+            self.assertTrue(SharedWordDictionary(index_file).contains("dross"))
+
+    def test_index_file_per_settings(self):
+        dictionary = get_word_dictionary()
+        other = WordDictionary(dictionary.filename, dictionary.base_word_file,
+                min_solutions=dictionary.min_solutions + 1)
+        self.assertEqual(get_shared_index_file(dictionary),
+                get_shared_index_file(get_word_dictionary()))
+        self.assertNotEqual(get_shared_index_file(dictionary),
+                get_shared_index_file(other))
+
+    def test_publish_to_temporary_directory(self):
+        with tempfile.TemporaryDirectory() as directory, \
+            tempfile.TemporaryDirectory() as temp_directory, \
+            patch.object(tempfile, "tempdir", temp_directory):
+            filename = os.path.join(directory, "words.txt")
+            with open(filename, "w") as f:
+                f.write("SWORD\nWORDS\nSWORDS\n")
+            dictionary = WordDictionary(filename, min_solutions=1)
+            write = sharedindex.write_shared_index
+
+            def write_outside(dictionary, index_file, digest):
+                # the word list's directory is read-only
+                if index_file.startswith(directory):
+                    raise PermissionError(index_file)
+                write(dictionary, index_file, digest)
+
+            with patch.object(sharedindex, "write_shared_index",
+                    side_effect=write_outside):
+                index_file = publish_word_dictionary(dictionary)
+            self.assertTrue(index_file.startswith(temp_directory))
+            self.assertEqual(SharedWordDictionary(index_file)
+                    .solutions("SWORDS"), ["SWORD", "WORDS", "SWORDS"])
+
+            with patch.object(sharedindex, "write_shared_index",
+                    side_effect=PermissionError):
+                self.assertEqual(publish_word_dictionary(dictionary),
+                        index_file)
+                os.remove(index_file)
+                self.assertIsNone(publish_word_dictionary(dictionary))
+
+    def test_not_an_index(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(bytes(4096))
+            f.flush()
+            with self.assertRaises(ValueError):
+                SharedWordDictionary(f.name)
+
+    @unittest.skipUnless(os.path.exists(SMAPS_ROLLUP),
+            "needs /proc/self/smaps_rollup")
+    def test_worker_private_memory(self):
+        index_file = publish_word_dictionary()
+        context = multiprocessing.get_context("spawn")
+        growth = {}
+        for source in (index_file, None):
+            for workers in (1, 4):
+                with context.Pool(workers) as pool:
+                    growth[source, workers] = max(pool.map(solve_in_worker,
+                        [source] * workers))
+
+        # the shared index costs each worker a small, flat amount of
+        # private memory, far less than its own copy of the word lists
+        for workers in (1, 4):
+            self.assertLess(growth[index_file, workers], 1024)
+            self.assertLess(growth[index_file, workers] * 4,
+                    growth[None, workers])
+
+
+if __name__ == "__main__":
+    unittest.main()
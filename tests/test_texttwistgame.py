@@ -1,27 +1,35 @@
 import unittest
+import random
 import sys
 import os
-import tkinter as tk
+import subprocess
+import tempfile
+import threading
+import time
 
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.abspath('..'))
-from texttwistgame import TextTwistGame
+from clock import Clock, TextVariable
+from texttwistgame import GAME_TIME, Puzzle, TextTwistGame, \
+        get_shared_puzzle
+import words
+from words import WordDictionary, get_word_dictionary
 
 
 class GameTest(unittest.TestCase):
 
-    def setUp(self):
-        self.root = tk.Tk()
-
     def test_level_passed(self):
         game = TextTwistGame()
-        game._TextTwistGame__wordlist = ["swords", "words"]
+        game._TextTwistGame__puzzle = Puzzle("swords", ["swords", "words"])
 
         game.word_entry_is_valid("swords")
         self.assertTrue(game.level_passed())
         
         game = TextTwistGame()
-        game._TextTwistGame__wordlist = ["swords", "sword", "word"]
+        game._TextTwistGame__puzzle = Puzzle("swords",
+                ["swords", "sword", "word"])
 
         game.word_entry_is_valid("sword")
         self.assertFalse(game.level_passed())
@@ -29,8 +37,243 @@ class GameTest(unittest.TestCase):
         game.word_entry_is_valid("word")
         self.assertFalse(game.level_passed())
 
+    def test_found_words(self):
+        game = TextTwistGame(clock=Clock(GAME_TIME, TextVariable()))
+        game._TextTwistGame__puzzle = Puzzle("swords",
+                ["sword", "words", "swords"])
+
+        self.assertTrue(game.word_entry_is_valid("words"))
+        self.assertFalse(game.word_entry_is_valid("words"))
+        self.assertFalse(game.word_entry_is_valid("drows"))
+        self.assertEqual(game.get_entered_words(), {"words"})
+        self.assertEqual(game.get_missing_solution_words(), {"sword", "swords"})
+        self.assertEqual(game.get_wordlist(), {"sword", "words", "swords"})
+        self.assertEqual(game.get_score(), 5)
+
+        game.word_entry_is_valid("sword")
+        game.word_entry_is_valid("swords")
+        self.assertEqual(game.get_missing_solution_words(), set())
+        self.assertEqual(game.get_score(), 16)
+        self.assertEqual(str(game.clock), "0:00")
+
+    def test_puzzle_shared_between_games(self):
+        dictionary = get_word_dictionary()
+        base_word = dictionary.random_base_word()
+        puzzle = get_shared_puzzle(dictionary, base_word)
+        self.assertIs(get_shared_puzzle(dictionary, base_word), puzzle)
+        self.assertEqual(list(puzzle.words), dictionary.solutions(base_word))
+
+        games = [TextTwistGame(dictionary, Clock(GAME_TIME, TextVariable()))
+                for _ in range(2)]
+        for game in games:
+            game._TextTwistGame__puzzle = puzzle
+        games[0].word_entry_is_valid(base_word)
+        self.assertEqual(games[0].get_entered_words(), {base_word})
+        self.assertEqual(games[1].get_entered_words(), set())
+
+    def test_shared_puzzle_rebuilt_on_reload(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+            patch.object(words, "WORD_FILE_CHECK_INTERVAL", 0):
+            filename = os.path.join(tmp, "words.txt")
+            with open(filename, "w") as f:
+                f.write("SWORD\nWORDS\n")
+            dictionary = WordDictionary(filename, None)
+            puzzle = get_shared_puzzle(dictionary, "SWORDS")
+            with patch.object(dictionary, "solutions") as solutions:
+                self.assertIs(get_shared_puzzle(dictionary, "SWORDS"), puzzle)
+            solutions.assert_not_called()
+
+            with open(filename, "w") as f:
+                f.write("SWORDS\nWORD\n")
+            os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns + 10**9))
+            self.assertEqual(get_shared_puzzle(dictionary, "SWORDS").words,
+                    ("SWORDS", "WORD"))
+
+
+class ConcurrentGamesTest(unittest.TestCase):
+
+    NUM_GAMES = 300
+    GAME_TIME = 1
+
+    def play(self, restart):
+        """
+        Start a game level, enter a word, and optionally restart the
+        clock mid-level. Return the game and an event that is set when
+        the level ends, and record each expiry in 'self.expiries'.
+        """
+        game = TextTwistGame(clock=Clock(self.GAME_TIME, TextVariable()))
+        expired = threading.Event()
+
+        def on_expired():
+            with self.lock:
+                self.expiries[id(game)] = self.expiries.get(id(game), 0) + 1
+            expired.set()
+
+        game.add_ui_callback("expired", on_expired)
+        game.start_game()
+        self.assertTrue(game.word_entry_is_valid(min(game.get_wordlist(),
+            key=len)))
+        if restart:
+            time.sleep(0.2)
+            game.run_clock()
+        return game, expired
+
+    def test_games_side_by_side(self):
+        self.lock = threading.Lock()
+        self.expiries = {}
+
+        # an unrelated thread must not stop any clock from starting
+        stop = threading.Event()
+        threading.Thread(target=stop.wait).start()
+        try:
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=32) as pool:
+                played = list(pool.map(self.play,
+                    [i % 3 == 0 for i in range(self.NUM_GAMES)]))
+            for game, expired in played:
+                self.assertTrue(expired.wait(5))
+            elapsed = time.monotonic() - start
+        finally:
+            stop.set()
+
+        self.assertLess(elapsed, self.GAME_TIME + 2)
+        self.assertEqual(len(self.expiries), self.NUM_GAMES)
+        self.assertEqual(set(self.expiries.values()), {1})
+        for game, _ in played:
+            self.assertEqual(len(game.get_entered_words()), 1)
+            self.assertEqual(str(game.clock), "0:00")
+
+    def test_reset_cancels_clock(self):
+        game = TextTwistGame(clock=Clock(self.GAME_TIME, TextVariable()))
+        expired = threading.Event()
+        game.add_ui_callback("expired", expired.set)
+
+        game.start_game()
+        game.reset_game()
+
+        self.assertFalse(expired.wait(self.GAME_TIME + 0.5))
+        self.assertFalse(game.clock.is_running())
+
+
+class ImportTest(unittest.TestCase):
+
+    # budget for importing the game core in a fresh interpreter
+    IMPORT_TIME_BUDGET_US = 150000
+
+    def test_import_is_headless_and_fast(self):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+            "import texttwistgame"], cwd=os.path.abspath('..'),
+            capture_output=True, text=True, check=True)
+        imports = {}
+        for line in result.stderr.splitlines()[1:]:
+            _, cumulative, name = line.split("|")
+            imports[name.strip()] = int(cumulative)
+
+        self.assertNotIn("tkinter", imports)
+        self.assertNotIn("numpy", imports)
+        self.assertLess(imports["texttwistgame"], self.IMPORT_TIME_BUDGET_US)
+
+
+class RackLengthTest(unittest.TestCase):
+
+    def test_level_passed_with_long_rack(self):
+        game = TextTwistGame(clock=Clock(GAME_TIME, TextVariable()),
+                rack_length=9)
+        game.start_game()
+        wordlist = game.get_wordlist()
+
+        self.assertEqual(game.get_rack_length(), 9)
+        self.assertEqual(len(game.get_letters()), 9)
+        for word in sorted(wordlist, key=len):
+            if len(word) < 9:
+                game.word_entry_is_valid(word)
+        self.assertFalse(game.level_passed())
+
+        game.word_entry_is_valid("".join(game.get_letters()))
+        self.assertTrue(game.level_passed())
+        game.reset_clock()
+
+
+class GatedDictionary(WordDictionary):
+    """
+    Dictionary whose background (prefetch) base word draws wait for
+    'gate' to be set.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def random_base_word(self, rng=random):
+        if threading.current_thread().name.startswith("puzzle_prefetch"):
+            self.gate.wait()
+        return super().random_base_word(rng)
+
+
+class PrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dictionary = GatedDictionary()
+        self.game = TextTwistGame(self.dictionary,
+                Clock(GAME_TIME, TextVariable()))
+
+    def test_prefetch_hit(self):
+        self.dictionary.gate.set()
+        self.game._TextTwistGame__next_puzzle[1].result()
+
+        self.game.start_game()
+
+        self.assertEqual((self.game.prefetch_hits, self.game.prefetch_misses),
+                (1, 0))
+        self.assertEqual(self.game.get_wordlist(),
+                set(self.dictionary.solutions("".join(
+                    self.game.get_letters()))))
+
+    def test_prefetch_miss(self):
+        self.game.start_game()
+
+        self.assertEqual((self.game.prefetch_hits, self.game.prefetch_misses),
+                (0, 1))
+        self.assertGreater(len(self.game.get_wordlist()), 0)
+
+    def test_miss_cancels_queued_prefetch(self):
+        # the worker is held by this game's prefetch, so the other
+        # game's prefetch is still queued
+        game = TextTwistGame(self.dictionary, Clock(GAME_TIME, TextVariable()))
+        queued = game._TextTwistGame__next_puzzle[1]
+        game.start_game()
+        self.assertTrue(queued.cancelled())
+
+        queued = game._TextTwistGame__next_puzzle[1]
+        game.reset_game()
+        self.assertTrue(queued.cancelled())
+        self.assertIsNone(game._TextTwistGame__next_puzzle)
+
+    def test_no_prefetch_at_creation(self):
+        game = TextTwistGame(self.dictionary, Clock(GAME_TIME, TextVariable()),
+                prefetch_first=False)
+        self.assertIsNone(game._TextTwistGame__next_puzzle)
+
+    def test_seed_determines_puzzles(self):
+        self.dictionary.gate.set()
+        letters = []
+        for prefetch in (False, True):
+            game = TextTwistGame(self.dictionary,
+                    Clock(GAME_TIME, TextVariable()), seed=7)
+            levels = []
+            for _ in range(3):
+                if prefetch:
+                    game._TextTwistGame__next_puzzle[1].result()
+                random.seed()
+                game.start_game()
+                levels.append(game.get_letters())
+            game.reset_clock()
+            letters.append(levels)
+        self.assertEqual(letters[0], letters[1])
+
     def tearDown(self):
-        self.root.destroy()
+        self.dictionary.gate.set()
+        self.game.reset_clock()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+import unittest
+import sys, os
+
+sys.path.insert(0, os.path.abspath('..'))
+from trie import Trie
+from words import *
+
+
+class TestTrie(unittest.TestCase):
+
+    def setUp(self):
+        self.words = ["SWORD", "SWORDS", "WORD", "WORDS", "ROW", "ROWS"]
+        self.trie = Trie.from_words(self.words, minimize=False)
+        self.dawg = Trie.from_words(self.words)
+
+    def test_contains(self):
+        for trie in (self.trie, self.dawg):
+            self.assertEqual(len(trie), len(self.words))
+            self.assertIn("SWORD", trie)
+            self.assertNotIn("SWOR", trie)
+            self.assertNotIn("SWORDSMAN", trie)
+
+    def test_minimize(self):
+        self.assertLess(self.dawg.count_nodes(), self.trie.count_nodes())
+        with self.assertRaises(ValueError):
+            self.dawg.add("DROWS")
+
+    def test_prefix_queries(self):
+        for trie in (self.trie, self.dawg):
+            self.assertTrue(trie.has_prefix("SWO"))
+            self.assertFalse(trie.has_prefix("X"))
+            self.assertEqual(trie.words_with_prefix("WO"), ["WORD", "WORDS"])
+            self.assertEqual(trie.words_with_prefix("X"), [])
+
+    def test_words_in_rack(self):
+        for trie in (self.trie, self.dawg):
+            self.assertEqual(trie.words_in_rack("DROWS"),
+                    ["ROW", "ROWS", "SWORD", "WORD", "WORDS"])
+            self.assertEqual(trie.words_in_rack("ROW"), ["ROW"])
+            self.assertEqual(trie.words_in_rack(""), [])
+
+    def test_words_in_rack_matches_dictionary(self):
+        trie = load_trie()
+        for rack in ("SWORDS", "ABACUS", "AAAAAA"):
+            self.assertEqual(sorted(trie.words_in_rack(rack)),
+                    sorted(get_words_from_base_word(rack)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import threading
+import unittest
+from unittest import mock
+import sys, os
+
+sys.path.insert(0, os.path.abspath('..'))
+from clock import Clock, TextVariable
+from ui import QueuedVariable, TextTwistUI, UpdateQueue, get_solution_grid
+
+
+class UpdateQueueTest(unittest.TestCase):
+
+    def test_updates_applied_in_order(self):
+        updates = UpdateQueue()
+        applied = []
+        for i in range(3):
+            updates.put(lambda i=i: applied.append(i))
+
+        self.assertEqual(applied, [])
+        self.assertEqual(updates.apply(), 3)
+        self.assertEqual(applied, [0, 1, 2])
+        self.assertEqual(updates.apply(), 0)
+
+    def test_keyed_updates_merged(self):
+        updates = UpdateQueue()
+        applied = []
+        updates.put(lambda: applied.append("a1"), "a")
+        updates.put(lambda: applied.append("b"))
+        updates.put(lambda: applied.append("a2"), "a")
+
+        self.assertEqual(updates.apply(), 2)
+        self.assertEqual(applied, ["b", "a2"])
+
+    def test_clock_updates_stay_off_variable_until_applied(self):
+        updates = UpdateQueue()
+        variable = TextVariable()
+        clock_text = QueuedVariable(updates, variable, "clock")
+        clock = Clock(5, clock_text)
+
+        setters = set()
+        variable.set = lambda value: setters.add(threading.current_thread())
+        reached_zero = threading.Event()
+        clock.observers.add(reached_zero.set)
+        clock.start()
+        self.assertEqual(clock_text.get(), "0:05")
+        clock -= 4
+        self.assertTrue(reached_zero.wait(3))
+
+        self.assertEqual(setters, set())
+        self.assertEqual(updates.apply(), 1)
+        self.assertEqual(setters, {threading.current_thread()})
+        self.assertEqual(clock_text.get(), "0:00")
+
+    def test_stale_clock_reached_zero_dropped(self):
+        ui = mock.MagicMock(level_run=1, updates=UpdateQueue())
+        ui.process_clock_reached_zero = lambda run: \
+                TextTwistUI.process_clock_reached_zero(ui, run)
+
+        # the level is restarted before the update is applied
+        TextTwistUI.queue_clock_reached_zero(ui)
+        ui.level_run += 1
+        self.assertEqual(ui.updates.apply(), 1)
+        ui.display_missing_words.assert_not_called()
+        ui.toggle_root_key_bindings.assert_not_called()
+
+        TextTwistUI.queue_clock_reached_zero(ui)
+        self.assertEqual(ui.updates.apply(), 1)
+        ui.display_missing_words.assert_called_once_with()
+
+
+class SolutionGridTest(unittest.TestCase):
+
+    def test_small_puzzles_keep_layout(self):
+        self.assertEqual(get_solution_grid(10, 12), (4, 3))
+        self.assertEqual(get_solution_grid(40, 12), (6, 7))
+
+    def test_large_puzzles_grow_in_height(self):
+        self.assertEqual(get_solution_grid(625, 4), (4, 157))
+        self.assertEqual(get_solution_grid(153, 4), (4, 39))
+        self.assertEqual(get_solution_grid(5, 0), (1, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,14 @@
 import unittest
 import sys, os
+import random
+import tempfile
+import threading
+import tracemalloc
+
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.abspath('..'))
+import words
 from words import *
 
 class TestWords(unittest.TestCase):
@@ -27,11 +34,357 @@ class TestWords(unittest.TestCase):
     def test_base_word_contains_test_word(self):
         self.assertTrue(base_word_contains_test_word("appear", "pear"))
         self.assertTrue(base_word_contains_test_word("crowds", "crows"))
+        self.assertFalse(base_word_contains_test_word("crowds", "crowd!"))
+        self.assertFalse(base_word_contains_test_word("appear", "papers"))
 
         with self.assertRaises(ValueError):
             base_word_contains_test_word("", "help")
         with self.assertRaises(ValueError):
             base_word_contains_test_word("help", "")
 
+
+    def test_get_words_from_base_word(self):
+        base_word = "SWORDS"
+        with open(ALL_WORDS_FILE, "r") as allwords:
+            expected = [word.strip() for word in allwords if
+                    base_word_contains_test_word(base_word, word.strip())]
+
+        self.assertEqual(get_words_from_base_word(base_word), expected)
+
+
+    def test_get_sub_signatures(self):
+        signatures = list(get_sub_signatures("ABACUS"))
+
+        self.assertEqual(len(signatures), len(set(signatures)))
+        self.assertEqual(len(signatures), 3*2*2*2*2 - 1)
+        self.assertIn("AABCSU", signatures)
+        self.assertIn("AA", signatures)
+        self.assertEqual(len(list(get_sub_signatures("ABACUS",
+            MIN_WORD_LENGTH))), len(signatures) - 5 - 11)
+
+    def test_get_puzzle(self):
+        base_word, solutions = get_puzzle()
+
+        self.assertGreaterEqual(len(solutions), MIN_SOLUTION_SET_SIZE)
+        self.assertEqual(solutions, get_words_from_base_word(base_word))
+
+
+    def test_build_puzzle_catalog(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base_word_file = os.path.join(tmp, "base.txt")
+            catalog_file = os.path.join(tmp, "catalog.txt.gz")
+            with open(base_word_file, "w") as f:
+                f.write("SWORDS\nQUIZZY\n")
+
+            build_puzzle_catalog(catalog_file, base_word_file,
+                    min_solutions=2)
+            catalog = load_puzzle_catalog(catalog_file)
+
+            self.assertEqual([entry[0] for entry in catalog], ["SWORDS"])
+            self.assertEqual(catalog[0][1],
+                    len(get_words_from_base_word("SWORDS")))
+            with self.assertRaises(ValueError):
+                get_puzzle(100, catalog_file)
+
+    def test_compiled_word_file_invalidation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "words.txt")
+            with open(filename, "w") as f:
+                f.write("SWORD\nWORDS\n")
+
+            compiled = load_compiled_word_file(filename)
+            self.assertTrue(os.path.exists(filename + COMPILED_FILE_SUFFIX))
+            self.assertEqual(compiled["signature_index"]["DORSW"], (0, 1))
+
+            # new modification time, same content: compiled file is reused
+            os.utime(filename, ns=(0, compiled["mtime_ns"] + 10**9))
+            words._compiled_word_files.clear()
+            self.assertEqual(load_compiled_word_file(filename)["words"],
+                    ["SWORD", "WORDS"])
+
+            # new content: compiled file is rebuilt
+            with open(filename, "w") as f:
+                f.write("CROWDS\n")
+            os.utime(filename, ns=(0, compiled["mtime_ns"] + 2*10**9))
+            words._compiled_word_files.clear()
+            self.assertEqual(load_compiled_word_file(filename)["words"],
+                    ["CROWDS"])
+
+    def test_mapped_word_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "words.txt")
+            with open(filename, "w") as f:
+                f.write("SWORD\nWORDS\r\nCROWDS")
+
+            mapped = MappedWordFile(filename)
+            self.assertEqual(list(mapped), ["SWORD", "WORDS", "CROWDS"])
+            self.assertEqual(mapped[-1], "CROWDS")
+            self.assertIn(random.choice(mapped), mapped)
+            with self.assertRaises(IndexError):
+                mapped[3]
+            self.assertTrue(os.path.exists(filename + LINE_INDEX_SUFFIX))
+
+            # changed word file: index is rebuilt
+            with open(filename, "w") as f:
+                f.write("SWORDS\n")
+            os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns + 10**9))
+            self.assertEqual(list(MappedWordFile(filename)), ["SWORDS"])
+
+            with open(filename, "w") as f:
+                pass
+            self.assertEqual(len(MappedWordFile(filename)), 0)
+
+            # truncated index: rebuilt
+            with open(filename, "w") as f:
+                f.write("SWORDS\n")
+            for size in (5, 8 * LINE_INDEX_HEADER + 3):
+                MappedWordFile(filename)
+                os.truncate(filename + LINE_INDEX_SUFFIX, size)
+                self.assertEqual(list(MappedWordFile(filename)), ["SWORDS"])
+
+    def test_mapped_word_file_validation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "words.txt")
+            for lines in ("SWORD\nAB1CDE\n", "SWORD\nHELLO WORLD\n",
+                    "SWORD\n\nWORDS\n"):
+                with open(filename, "w") as f:
+                    f.write(lines)
+                with patch("builtins.print") as printed, \
+                    self.assertRaises(SystemExit):
+                    MappedWordFile(filename)
+                self.assertEqual(" ".join(map(str, printed.call_args.args)),
+                    f"Formatting error on line 2 of '{filename}'. Exiting.")
+                self.assertFalse(os.path.exists(filename + LINE_INDEX_SUFFIX))
+
+    def test_base_words_remapped_on_file_change(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+            patch.object(words, "WORD_FILE_CHECK_INTERVAL", 0):
+            filename = os.path.join(tmp, "words.txt")
+            base_word_file = os.path.join(tmp, "base.txt")
+            with open(filename, "w") as f:
+                f.write("SWORD\nWORDS\nSWORDS\nCROWDS\n")
+            with open(base_word_file, "w") as f:
+                f.write("SWORDS\n" * 1000)
+            dictionary = WordDictionary(filename, base_word_file,
+                    min_solutions=1)
+            self.assertEqual(dictionary.random_base_word(), "SWORDS")
+
+            # rewritten in place, and shorter
+            with open(base_word_file, "w") as f:
+                f.write("CROWDS\n")
+            os.utime(base_word_file,
+                    ns=(0, os.stat(base_word_file).st_mtime_ns + 10**9))
+            self.assertEqual({dictionary.random_base_word()
+                for _ in range(20)}, {"CROWDS"})
+
+            # deleted
+            os.remove(base_word_file)
+            with patch("builtins.print") as printed, \
+                self.assertRaises(SystemExit):
+                dictionary.random_base_word()
+            self.assertEqual(printed.call_args.args, (f"'{base_word_file}' "
+                "is not a valid file. Exiting.",))
+
+    def test_mapped_word_file_memory(self):
+        with open(ALL_WORDS_FILE, "r", encoding="utf-8") as f:
+            num_lines = sum(1 for _ in f)
+        get_mapped_word_file(ALL_WORDS_FILE)
+
+        tracemalloc.start()
+        try:
+            mapped = MappedWordFile(ALL_WORDS_FILE)
+            for _ in range(10000):
+                random.choice(mapped)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(len(mapped), num_lines)
+        self.assertLess(peak, 64 * 1024)
+
+    def test_get_words_in_rack(self):
+        for rack in ("SWORDS", "ABACUS", ""):
+            self.assertEqual(get_words_in_rack(rack),
+                    get_words_from_base_word(rack))
+
+
+    def test_screen_racks(self):
+        racks = ["SWORDS", "ABACUS"]
+        word_list = load_compiled_word_file(ALL_WORDS_FILE)["words"]
+
+        for backend in (import_numpy(), None):
+            with patch.object(words, "numpy", backend), \
+                patch.dict(words._letter_count_matrices, clear=True):
+                screened = screen_racks(racks)
+                for rack, row in zip(racks, screened):
+                    self.assertEqual(
+                        [word for word, fits in zip(word_list, row) if fits],
+                        get_words_from_base_word(rack))
+
+    def test_get_letter_mask(self):
+        self.assertEqual(get_letter_mask("ABBA"), 0b11)
+        self.assertEqual(get_letter_mask("Z"), 1 << 25)
+        self.assertEqual(get_letter_mask("Ze"), (1 << 25) | OTHER_LETTERS_BIT)
+
+
+    def test_scan_words_in_rack(self):
+        for rack in ("SWORDS", "ABACUS", "AAAAAA", ""):
+            self.assertEqual(scan_words_in_rack(rack),
+                    get_words_from_base_word(rack))
+
+    def test_packed_contains(self):
+        word_list = load_compiled_word_file(ALL_WORDS_FILE)["words"]
+        for rack in ("SWORDS", "ABACUS", "AAAAAA", "MISSISSIPPI"):
+            packed_rack = get_packed_counts(rack, clamp=True)
+            for word in word_list[::7]:
+                self.assertEqual(packed_contains(packed_rack,
+                    get_packed_counts(word)),
+                    base_word_contains_test_word(rack, word))
+
+        self.assertIsNone(get_packed_counts("ÉTUDES"))
+        self.assertIsNone(get_packed_counts("A" * (PACKED_MAX_COUNT + 1)))
+        self.assertEqual(get_packed_counts("A" * 9, clamp=True),
+                get_packed_counts("A" * PACKED_MAX_COUNT))
+
+    def test_scan_words_in_rack_packed(self):
+        for rack in ("SWORDS", "ABACUS", "AAAAAA", ""):
+            self.assertEqual(scan_words_in_rack_packed(rack),
+                    get_words_from_base_word(rack))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "words.txt")
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write("ÉTUDES\nDUST\nAAAAAAAAB\nSTUDIES\n")
+            self.assertEqual(load_compiled_word_file(filename)["unpacked"],
+                    (0, 2))
+            self.assertEqual(scan_words_in_rack_packed("STUDIES", filename),
+                    ["DUST", "STUDIES"])
+            self.assertEqual(scan_words_in_rack_packed("ÉTUDES", filename),
+                    ["ÉTUDES", "DUST"])
+            self.assertEqual(scan_words_in_rack_packed("BAAAAAAAA", filename),
+                    ["AAAAAAAAB"])
+
+    def test_word_dictionary(self):
+        dictionary = WordDictionary()
+
+        base_word = dictionary.random_base_word()
+        self.assertTrue(dictionary.contains(base_word))
+        self.assertFalse(dictionary.contains("DROWSS"))
+        self.assertGreaterEqual(len(dictionary.solutions(base_word)),
+                MIN_SOLUTION_SET_SIZE)
+        self.assertIs(get_word_dictionary(), get_word_dictionary())
+
+
+    def test_rack_dictionary(self):
+        for rack_length in range(MAX_WORD_LENGTH, MAX_RACK_LENGTH + 1):
+            dictionary = get_rack_dictionary(rack_length)
+            base_word = dictionary.random_base_word()
+            solutions = dictionary.solutions(base_word)
+
+            self.assertEqual(len(base_word), rack_length)
+            self.assertIn(base_word, solutions)
+            self.assertGreaterEqual(len(solutions), MIN_SOLUTION_SET_SIZE)
+            self.assertGreaterEqual(min(map(len, solutions)), MIN_WORD_LENGTH)
+            for word in solutions:
+                self.assertTrue(base_word_contains_test_word(base_word, word))
+
+        self.assertIs(get_rack_dictionary(), get_word_dictionary())
+        self.assertRaises(ValueError, get_rack_dictionary, MAX_RACK_LENGTH + 1)
+
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats(), {"size": 2, "entries": 2,
+            "hits": 2, "misses": 1, "evictions": 1})
+
+    def test_solution_cache(self):
+        dictionary = WordDictionary(cache_size=8)
+        expected = get_words_from_base_word("SWORDS")
+
+        self.assertEqual(dictionary.solutions("SWORDS"), expected)
+        self.assertEqual(dictionary.solutions("DROSSW"), expected)
+        self.assertEqual(dictionary.solution_cache.stats()["hits"], 1)
+        self.assertEqual(len(dictionary.solution_cache), 1)
+
+        solved = []
+        def solve():
+            for rack in ["SWORDS", "ABACUS", "CROWDS"] * 50:
+                solved.append(dictionary.solutions(rack) ==
+                        get_words_from_base_word(rack))
+        threads = [threading.Thread(target=solve) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(solved))
+
+    def test_solution_cache_invalidated_on_file_change(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+            patch.object(words, "WORD_FILE_CHECK_INTERVAL", 0):
+            filename = os.path.join(tmp, "words.txt")
+            with open(filename, "w") as f:
+                f.write("SWORD\nWORDS\n")
+            dictionary = WordDictionary(filename, None)
+            self.assertEqual(dictionary.solutions("SWORDS"),
+                    ["SWORD", "WORDS"])
+
+            with open(filename, "w") as f:
+                f.write("SWORDS\nWORD\n")
+            os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns + 10**9))
+
+            self.assertEqual(dictionary.solutions("SWORDS"),
+                    ["SWORDS", "WORD"])
+            self.assertEqual(dictionary.solution_cache.stats()["hits"], 0)
+
+
+    def test_word_dictionary_loads_once(self):
+        dictionary = WordDictionary()
+        barrier = threading.Barrier(8)
+        results = []
+
+        def solve():
+            barrier.wait()
+            results.append(dictionary.solutions("SWORDS"))
+
+        with patch.object(words, "load_compiled_word_file",
+                wraps=load_compiled_word_file) as load:
+            threads = [threading.Thread(target=solve) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        load.assert_called_once_with(ALL_WORDS_FILE)
+        self.assertEqual(results, [get_words_from_base_word("SWORDS")] * 8)
+
+    def test_word_dictionary_reloaded_while_in_use(self):
+        dictionary = WordDictionary()
+        lock = threading.RLock()
+
+        class ReloadOnReleaseLock:
+            """
+            The dictionary's lock, where another thread resets the
+            dictionary for a reload as soon as it is released.
+            """
+            def __enter__(self):
+                lock.acquire()
+
+            def __exit__(self, *exc_info):
+                lock.release()
+                dictionary._WordDictionary__loaded = None
+                dictionary._WordDictionary__base_words = None
+
+        dictionary._WordDictionary__lock = ReloadOnReleaseLock()
+        self.assertEqual(dictionary.solutions("SWORDS"),
+                get_words_from_base_word("SWORDS"))
+        self.assertEqual(len(dictionary.random_base_word()), MAX_WORD_LENGTH)
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,7 @@
-import threading
+import instrumentation
+import random
+
+from concurrent.futures import ThreadPoolExecutor
 
 from clock import Clock
 from words import *
@@ -6,6 +9,66 @@ from words import *
 
 GAME_TIME = 120
 
+# number of puzzles kept for sharing between games
+PUZZLE_CACHE_SIZE = 4096
+
+# background worker that computes the next puzzle of every game
+_prefetch_executor = ThreadPoolExecutor(max_workers=1,
+        thread_name_prefix="puzzle_prefetch")
+
+# puzzles by dictionary and base word, see 'get_shared_puzzle'
+_puzzle_cache = LRUCache(PUZZLE_CACHE_SIZE, "game.puzzle_cache")
+
+
+class Puzzle:
+    """
+    Letters and solution words of a level
+
+    A puzzle is immutable and shared by every game playing it. Solution
+    word i is represented by bit i, so a game tracks the words found so
+    far as an int with one bit set per word.
+    """
+
+    __slots__ = ("letters", "words", "word_bits", "all_words")
+
+    def __init__(self, letters, words):
+        """
+        Create a puzzle of the letters 'letters' and the solution words
+        'words'.
+        """
+        self.letters = tuple(letters)
+        self.words = tuple(words)
+        self.word_bits = {word: 1 << i for i, word in enumerate(self.words)}
+        self.all_words = (1 << len(self.words)) - 1
+
+
+    def get_words(self, mask):
+        """
+        Get the set of the solution words whose bits are set in 'mask'.
+        """
+        words = set()
+        while mask:
+            bit = mask & -mask
+            words.add(self.words[bit.bit_length() - 1])
+            mask ^= bit
+        return words
+
+
+def get_shared_puzzle(dictionary, base_word):
+    """
+    Get the puzzle of 'base_word' in 'dictionary'. Games that draw the
+    same base word share one Puzzle, as long as it is in the puzzle
+    cache and the dictionary has not been reloaded since. The
+    solutions are only looked up to build a new Puzzle.
+    """
+    key = (dictionary, dictionary.generation(), base_word)
+    puzzle = _puzzle_cache.get(key)
+    if puzzle is None:
+        puzzle = Puzzle(base_word, dictionary.solutions(base_word))
+        _puzzle_cache.put(key, puzzle)
+    return puzzle
+
+
 class TextTwistGame:
     """
     Main game class
@@ -15,14 +78,32 @@ class TextTwistGame:
     and level completion status.
     """
 
-    def __init__(self):
+    def __init__(self, dictionary=None, clock=None,
+            rack_length=MAX_WORD_LENGTH, seed=None, prefetch_first=True):
         """
-        Create a game instance
+        Create a game instance. Puzzles are drawn from 'dictionary', or
+        from the process-wide WordDictionary for racks of 'rack_length'
+        letters, which is shared by all game instances. The game clock
+        is 'clock', or a new clock set to GAME_TIME.
+
+        The sequence of puzzles is determined by 'seed' (random if not
+        given), through the game's own random state 'random'. The first
+        puzzle is prefetched right away unless 'prefetch_first' is
+        False, e.g. because the first level starts immediately.
         """
-        self.clock = Clock(GAME_TIME)
+        self.dictionary = dictionary or get_rack_dictionary(rack_length)
+        self.clock = clock or Clock(GAME_TIME)
         self.clock.observers.add(self.notify_clock_reached_zero)
+        self.__clock_handle = None
+
+        self.random = random.Random(seed)
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+        self.__next_puzzle = None
 
         self.reset_game()
+        if prefetch_first:
+            self.prefetch_puzzle()
         self.ui_callbacks = {}
 
 
@@ -37,20 +118,27 @@ class TextTwistGame:
         """
         Return the current letters of the game instance.
         """
-        return self.__letters
+        return self.__puzzle.letters
+
+
+    def get_rack_length(self):
+        """
+        Return the number of letters in a puzzle of this game.
+        """
+        return self.dictionary.rack_length
 
 
     def get_wordlist(self):
         """
-        Return the list of all words that can be made with
-        the current game letters.
+        Return a read-only, set-like view of all words that can be
+        made with the current game letters.
         """
-        return self.__wordlist
+        return self.__puzzle.word_bits.keys()
 
 
     def word_entry_is_valid(self, word):
         """
-        Check if 'word' is a valid entry, based on '__wordlist'.
+        Check if 'word' is a valid entry, based on the puzzle's words.
         If so, add it to the solution set, check level completion
         conditions, and return True. Otherwise, return False.
 
@@ -58,17 +146,18 @@ class TextTwistGame:
         the current solution set (user-entered words) will
         return False.
         """
-        if word not in self.__entered_words and word in self.__wordlist:
-            self.__entered_words.add(word)
+        bit = self.__puzzle.word_bits.get(word, 0)
+        if bit and not self.__found_words & bit:
+            self.__found_words |= bit
             self.__score += len(word)
 
-            # got six-letter word, level passed
-            if len(word) == 6:
+            # got a word using all the letters, level passed
+            if len(word) == self.dictionary.rack_length:
                 self.__level_passed = True
 
             # solution word set contains all words from wordlist
             # puzzle finished before time, set clock to zero
-            if len(self.__entered_words) == len(self.__wordlist):
+            if self.__found_words == self.__puzzle.all_words:
                 self.clock.set_to_zero()
 
             return True
@@ -76,12 +165,21 @@ class TextTwistGame:
             return False
 
 
+    def get_entered_words(self):
+        """
+        Return the words that have been entered into the solution
+        set so far.
+        """
+        return self.__puzzle.get_words(self.__found_words)
+
+
     def get_missing_solution_words(self):
         """
         Return the words from the wordlist that have not been
         entered into the solution set yet.
         """
-        return self.__wordlist.difference(self.__entered_words)
+        return self.__puzzle.get_words(
+                self.__puzzle.all_words & ~self.__found_words)
 
 
     def level_passed(self):
@@ -96,24 +194,22 @@ class TextTwistGame:
 
     def run_clock(self):
         """
-        Run the game clock in its own thread.
+        Start the game clock, or restart it if the current level's
+        run is still going. The game owns the run through its clock
+        handle, and the clock is driven by the shared timer service,
+        so any number of games can run side by side in one process.
         """
-        clock_thread = threading.Thread(target=self.clock.run,
-                                        name="clock_thread")
-
-        # If a clock thread is already running, we don't want to
-        # start another one. Simply reset (restart) the timer
-        # for the current thread.
-        if (threading.active_count() > 1):
-            self.clock.reset_while_running()
-        else:
-            clock_thread.start()
+        if self.__clock_handle is None or not self.__clock_handle.restart():
+            self.__clock_handle = self.clock.start()
 
 
     def reset_clock(self):
         """
-        Reset the game clock.
+        Cancel the game's clock run, if any, and reset the game clock.
         """
+        if self.__clock_handle is not None:
+            self.__clock_handle.cancel()
+            self.__clock_handle = None
         self.clock.reset()
 
 
@@ -137,11 +233,67 @@ class TextTwistGame:
         Start a game level. Reset instance variables associated with
         a level and run the clock.
         """
-        self.__level_passed = False
-        self.__entered_words = set()
-        self.__letters = list(get_six_letter_word())
-        self.__wordlist = set(get_words_from_base_word("".join(self.__letters)))
-        self.run_clock()
+        with instrumentation.phase("game.start_game"):
+            self.__level_passed = False
+            self.__found_words = 0
+            self.__puzzle = self.take_puzzle()
+            self.run_clock()
+        self.prefetch_puzzle()
+
+
+    def prefetch_puzzle(self):
+        """
+        Start computing the next level's puzzle in the background.
+
+        The puzzle's seed is drawn from the game's random state now,
+        so the puzzle is the same whether the prefetch is used or not.
+        """
+        self.cancel_prefetch()
+        seed = self.random.getrandbits(64)
+        self.__next_puzzle = seed, _prefetch_executor.submit(
+                self.generate_puzzle, random.Random(seed))
+
+
+    def cancel_prefetch(self):
+        """
+        Drop the prefetched puzzle, cancelling its computation if it
+        has not started yet.
+        """
+        if self.__next_puzzle is not None:
+            self.__next_puzzle[1].cancel()
+            self.__next_puzzle = None
+
+
+    def take_puzzle(self):
+        """
+        Get the prefetched puzzle, if it is ready. Otherwise (a cache
+        miss), cancel the prefetch and generate the same puzzle now,
+        without waiting for the background worker.
+        """
+        if self.__next_puzzle is None:
+            seed, next_puzzle = self.random.getrandbits(64), None
+        else:
+            seed, next_puzzle = self.__next_puzzle
+            self.__next_puzzle = None
+        if next_puzzle is not None and next_puzzle.done() and \
+            not next_puzzle.cancelled() and next_puzzle.exception() is None:
+            self.prefetch_hits += 1
+            return next_puzzle.result()
+
+        if next_puzzle is not None:
+            next_puzzle.cancel()
+        self.prefetch_misses += 1
+        instrumentation.count("game.prefetch_misses")
+        return self.generate_puzzle(random.Random(seed))
+
+
+    def generate_puzzle(self, rng):
+        """
+        Choose a base word, drawing from the random state 'rng', and
+        return its Puzzle.
+        """
+        return get_shared_puzzle(self.dictionary,
+                self.dictionary.random_base_word(rng))
 
 
     def reset_game(self):
@@ -149,9 +301,9 @@ class TextTwistGame:
         Reset all instance variables of the game to their starting
         state. This is a hard reset that will zero the score.
         """
-        self.__letters = []
-        self.__wordlist = set()
-        self.__entered_words = set()
+        self.cancel_prefetch()
+        self.__puzzle = Puzzle((), ())
+        self.__found_words = 0
         self.__score = 0
         self.__level_passed = False
         self.reset_clock()
@@ -0,0 +1,258 @@
+"""
+trie.py
+
+Trie/DAWG of dictionary words, for finding every word that can be made
+from a rack of letters and for prefix queries.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+from collections import Counter
+
+
+class _Node:
+    """
+    A node of a trie. Each edge to a child node is labelled with a
+    letter. 'is_word' is set if the path from the root to the node
+    spells a word.
+    """
+
+    __slots__ = ("children", "is_word")
+
+    def __init__(self):
+        self.children = {}
+        self.is_word = False
+
+
+class Trie:
+    """
+    Trie of dictionary words
+
+    After 'minimize', nodes with identical subtrees are shared, which
+    turns the trie into a DAWG (directed acyclic word graph) with the
+    same set of words, but far fewer nodes. A minimized trie can no
+    longer have words added.
+    """
+
+    def __init__(self):
+        """
+        Create an empty trie.
+        """
+        self.root = _Node()
+        self.minimized = False
+        self.__num_words = 0
+
+
+    @classmethod
+    def from_words(cls, words, minimize=True):
+        """
+        Create a trie holding all words in the iterable 'words',
+        minimized to a DAWG by default.
+        """
+        trie = cls()
+        for word in words:
+            trie.add(word)
+        if minimize:
+            trie.minimize()
+        return trie
+
+
+    def add(self, word):
+        """
+        Add 'word' to the trie.
+        """
+        if self.minimized:
+            raise ValueError("Cannot add words to a minimized trie.")
+
+        node = self.root
+        for letter in word:
+            child = node.children.get(letter)
+            if child is None:
+                child = node.children[letter] = _Node()
+            node = child
+        if not node.is_word:
+            node.is_word = True
+            self.__num_words += 1
+
+
+    def minimize(self):
+        """
+        Share all nodes with identical subtrees, bottom-up, so that
+        common suffixes are stored only once.
+        """
+        register = {}
+
+        def canonical(node):
+            for letter, child in node.children.items():
+                node.children[letter] = canonical(child)
+            key = (node.is_word, frozenset(
+                (letter, id(child)) for letter, child in node.children.items()))
+            return register.setdefault(key, node)
+
+        self.root = canonical(self.root)
+        self.minimized = True
+
+        # 'canonical' refers to itself, so the register would otherwise
+        # keep the replaced nodes alive until the next garbage collection
+        register.clear()
+
+
+    def count_nodes(self):
+        """
+        Count the distinct nodes in the trie.
+        """
+        seen = set()
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if id(node) not in seen:
+                seen.add(id(node))
+                stack.extend(node.children.values())
+        return len(seen)
+
+
+    def __len__(self):
+        """
+        Number of words in the trie.
+        """
+        return self.__num_words
+
+
+    def __contains__(self, word):
+        """
+        Check if 'word' is in the trie.
+        """
+        node = self._find(word)
+        return node is not None and node.is_word
+
+
+    def has_prefix(self, prefix):
+        """
+        Check if any word in the trie starts with 'prefix'.
+        """
+        return self._find(prefix) is not None
+
+
+    def words_with_prefix(self, prefix):
+        """
+        Get a sorted list of all words in the trie that start
+        with 'prefix'.
+        """
+        node = self._find(prefix)
+        if node is None:
+            return []
+
+        results = []
+        stack = [(node, prefix)]
+        while stack:
+            node, word = stack.pop()
+            if node.is_word:
+                results.append(word)
+            for letter, child in node.children.items():
+                stack.append((child, word + letter))
+        return sorted(results)
+
+
+    def words_in_rack(self, rack):
+        """
+        Get a sorted list of all words in the trie that can be made
+        from the letters in 'rack', each letter used at most as many
+        times as it appears in the rack.
+
+        The trie is walked depth first, consuming letters from the
+        remaining letter counts. Only the letters still available are
+        tried at each node, so a branch is pruned as soon as none of
+        its child letters is left in the rack.
+        """
+        remaining = Counter(rack)
+        letters = sorted(remaining)
+        results = []
+        prefix = []
+
+        def visit(node):
+            children = node.children
+            for letter in letters:
+                if not remaining[letter]:
+                    continue
+                child = children.get(letter)
+                if child is None:
+                    continue
+                remaining[letter] -= 1
+                prefix.append(letter)
+                if child.is_word:
+                    results.append("".join(prefix))
+                if child.children:
+                    visit(child)
+                prefix.pop()
+                remaining[letter] += 1
+
+        visit(self.root)
+        return results
+
+
+    def _find(self, prefix):
+        """
+        Get the node reached by following 'prefix' from the root, or
+        None if no word starts with 'prefix'.
+        """
+        node = self.root
+        for letter in prefix:
+            node = node.children.get(letter)
+            if node is None:
+                return None
+        return node
+
+
+def measure_trie(words, minimize=True):
+    """
+    Build a trie from the list 'words'. Return the trie, the build
+    time in seconds and the memory allocated for it in bytes.
+
+    The trie is built twice, since tracing memory allocations slows
+    down the build several times over.
+    """
+    start = time.perf_counter()
+    Trie.from_words(words, minimize)
+    build_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    trie = Trie.from_words(words, minimize)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return trie, build_time, memory
+
+
+# report build time, memory use and rack search times
+if __name__ == '__main__':
+    from words import ALL_WORDS_FILE, WORDLIST_DIR, load_compiled_word_file
+
+    # the original word list has proper nouns and possessives, which
+    # are left out, as in allwords.txt
+    with open(os.path.join(WORDLIST_DIR, "original_wordlist"), "r") as f:
+        original_words = [word.upper() for word in map(str.strip, f)
+                if word.isalpha() and word.islower()]
+
+    sources = {
+        "allwords.txt": load_compiled_word_file(ALL_WORDS_FILE)["words"],
+        "original_wordlist": original_words,
+    }
+    racks = sys.argv[1:] or ["SWORDS", "TRAINED", "STRAINED",
+            "CONSTRAINED"[:9], "DEPARTMENTS"[:10]]
+
+    for name, words in sources.items():
+        for minimize in (False, True):
+            trie, build_time, memory = measure_trie(words, minimize)
+            kind = "DAWG" if minimize else "trie"
+            print(f"{name} {kind}: {len(trie)} words, "
+                    f"{trie.count_nodes()} nodes, "
+                    f"built in {build_time*1000:.0f} ms, "
+                    f"{memory/2**20:.1f} MiB")
+        for rack in racks:
+            start = time.perf_counter()
+            found = trie.words_in_rack(rack)
+            elapsed = time.perf_counter() - start
+            print(f"  {rack:12} {len(found):5} words "
+                    f"{elapsed*1000:8.2f} ms")
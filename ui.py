@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 
 import tkinter as tk
+import tkinter.font
+import queue
 import threading
-import random
 
 from tkinter.constants import DISABLED, NORMAL
-from string import ascii_lowercase, ascii_uppercase
+from string import ascii_lowercase
 from game_instructions import INSTRUCTIONS
 
+import instrumentation
+
+from rack import Rack
+
 NSEW = (tk.N, tk.S, tk.E, tk.W)
 WINDOW_HEIGHT = 500
 WINDOW_WIDTH = 600
@@ -17,10 +22,14 @@ TEXT_ENTRY_FONT = (FONT, 48)
 SOLUTION_WORD_FONT = (FONT, 24)
 SOLUTION_GRID_HEIGHT = 7
 MIN_SOLUTION_GRID_HEIGHT = 4
+SOLUTION_WORD_PADDING = 3
 GAME_STATUS_FONT = (FONT, 24)
 
 PUZZLE_WORD_LENGTH = 6
 
+# interval at which queued updates are applied on the tkinter main loop
+FRAME_MS = 16
+
 ON = 1
 OFF = 0
 
@@ -35,15 +44,27 @@ class TextTwistUI:
     clock stopped)
     """
 
-    def __init__(self):
+    def __init__(self, rack_length=PUZZLE_WORD_LENGTH):
         """
         Initialize tk root window and add the key bindings
-        for gameplay.
-        """
+        for gameplay. Puzzles have 'rack_length' letters.
+        """
+        self.rack_length = rack_length
+        self.letter_font = (FONT, TEXT_ENTRY_FONT[1] * PUZZLE_WORD_LENGTH
+                // max(rack_length, PUZZLE_WORD_LENGTH))
+        self.solution_font = (FONT, SOLUTION_WORD_FONT[1] * PUZZLE_WORD_LENGTH
+                // max(rack_length, PUZZLE_WORD_LENGTH))
+        self.rack = Rack(rack_length)
         self.__root = tk.Tk()
         self.__root.columnconfigure(0, weight=1)
         self.__root.rowconfigure(0, weight=1)
         self.create_content_pane(self.__root)
+        self.render_rack()
+
+        self.level_run = 0      # counts levels started or reset
+        self.updates = UpdateQueue()
+        self.clock_text = QueuedVariable(self.updates, tk.StringVar(), "clock")
+        self.__root.after(FRAME_MS, self.apply_queued_updates)
 
         self.create_key_bindings_dictionary()
 
@@ -174,12 +195,11 @@ class TextTwistUI:
         Add boxes which will display characters that the user types.
         """
         self.entry_labels = []
-        for i in range(PUZZLE_WORD_LENGTH):
-            label = tk.Label(parent, font=TEXT_ENTRY_FONT, bg="white")
+        for i in range(self.rack_length):
+            label = tk.Label(parent, font=self.letter_font, bg="white")
             label.grid(row=0, column=i)
             self.entry_labels.append(label)
-
-        self.reset_entry_label_text()
+        self.rendered_entry = [None] * self.rack_length
 
         parent.rowconfigure(0, weight=1)
         parent.grid_propagate(False)
@@ -187,14 +207,6 @@ class TextTwistUI:
             parent.columnconfigure(i, weight=1)
 
 
-    def reset_entry_label_text(self, text="_"):
-        """
-        Reset all entry labels with default character, underscore.
-        """
-        for entry_label in self.entry_labels:
-            entry_label['text'] = text
-
-
     def add_letter_display_frame(self, parent, width, height, padding):
         """
         Add the frame which will show the available letters for the puzzle.
@@ -212,10 +224,11 @@ class TextTwistUI:
         """
         self.letter_labels = []
 
-        for i in range(6):
-            label = tk.Label(parent, font=TEXT_ENTRY_FONT)
+        for i in range(self.rack_length):
+            label = tk.Label(parent, font=self.letter_font)
             label.grid(row=0, column=i)
             self.letter_labels.append(label)
+        self.rendered_letters = [None] * self.rack_length
 
         parent.rowconfigure(0, weight=1)
         parent.grid_propagate(False)
@@ -262,7 +275,6 @@ class TextTwistUI:
         """
         Reset the text entry and letter display areas to all blanks.
         """
-        self.reset_entry_label_text() 
         self.set_display_letters()
 
 
@@ -271,18 +283,31 @@ class TextTwistUI:
         Move all letters from text entry area to display area,
         leaving text entry area blank.
         """
-        self.reset_entry_label_text()
         self.set_display_letters(self.game.get_letters())
 
 
-    def set_display_letters(self, letters=[" "]*6):
+    def set_display_letters(self, letters=None):
         """
-        Set the letters in the letter display labels.
+        Set the letters in the letter display labels, in random order,
+        or blanks if 'letters' is not given. Clears the text entry.
         """
-        self.letters = letters
-        random.shuffle(self.letters)
-        for i, c in enumerate(self.letters):
-            self.letter_labels[i].config(text=c)
+        self.rack.set_letters(letters)
+        self.render_rack()
+
+
+    def render_rack(self):
+        """
+        Push the cells of the rack model that changed since the last
+        render to the text entry and letter display labels.
+        """
+        for labels, cells, rendered in (
+                (self.entry_labels, self.rack.entry, self.rendered_entry),
+                (self.letter_labels, self.rack.letters,
+                    self.rendered_letters)):
+            for i, text in enumerate(cells):
+                if rendered[i] != text:
+                    labels[i]['text'] = text
+                    rendered[i] = text
 
 
     def set_solution_word_labels(self):
@@ -290,32 +315,63 @@ class TextTwistUI:
         Populate top pane with empty text labels corresponding to each
         word in the solution set.
         """
-        parent = self.top_pane
-        self.solution_labels = []
+        with instrumentation.phase("ui.set_solution_word_labels"):
+            self._create_solution_word_labels(self.top_pane)
+
+
+    def _create_solution_word_labels(self, parent):
+        """
+        Helper method for 'set_solution_word_labels'. Create the labels
+        and lay them out in a grid in 'parent'. Each solution word gets
+        its own label, kept in 'solution_labels' by word.
+
+        The grid has as many columns as fit the window width, and
+        scrolls vertically when its rows don't fit the pane.
+        """
+        self.solution_labels = {}
         wordlist = self.game.get_wordlist()
 
-        grid_width = set_grid_width(len(wordlist))
-        grid_height = (len(wordlist) + grid_width - 1) // grid_width
+        canvas = tk.Canvas(parent, highlightthickness=0,
+                width=WINDOW_WIDTH, height=WINDOW_HEIGHT/2)
+        scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL,
+                command=canvas.yview)
+        canvas.configure(yscrollcommand=scrollbar.set)
+        canvas.grid(row=0, column=0, sticky=NSEW)
+        frame = tk.Frame(canvas)
+        window = canvas.create_window(0, 0, window=frame, anchor=tk.NW)
+
+        column_width = tkinter.font.Font(font=self.solution_font).measure(
+                "_" * self.rack_length) + 4 * SOLUTION_WORD_PADDING
+        grid_width, grid_height = get_solution_grid(len(wordlist),
+                WINDOW_WIDTH // column_width)
 
         for i, word in enumerate(sorted(wordlist, key=len)):
-            label = tk.Label(parent, font=SOLUTION_WORD_FONT,
+            label = tk.Label(frame, font=self.solution_font,
                 text="_"*len(word), bg="white")
             label.grid(row=(i%grid_height), column=(i//grid_height),
-                    padx=3, pady=3)
-            self.solution_labels.append(label)
-
-        grid_dims = parent.grid_size()
-
-        for j in range(grid_dims[0]):
-            if 0 <= j < grid_width:
-                parent.columnconfigure(j, weight=1)
-            else:
-                parent.columnconfigure(j, weight=0)
-        for i in range(grid_dims[1]):
-            if 0 <= i < grid_height:
-                parent.rowconfigure(i, weight=1)
+                    padx=SOLUTION_WORD_PADDING, pady=SOLUTION_WORD_PADDING)
+            self.solution_labels[word] = label
+        instrumentation.count("ui.labels_created", len(self.solution_labels))
+
+        for j in range(grid_width):
+            frame.columnconfigure(j, weight=1)
+        for i in range(grid_height):
+            frame.rowconfigure(i, weight=1)
+
+        def fit_to_canvas(event):
+            # spread the grid over the pane, or scroll it if too tall
+            height = max(event.height, frame.winfo_reqheight())
+            canvas.itemconfigure(window, width=event.width, height=height)
+            canvas.configure(scrollregion=(0, 0, event.width, height))
+            if height > event.height:
+                scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
             else:
-                parent.rowconfigure(i, weight=0)
+                scrollbar.grid_remove()
+
+        canvas.bind("<Configure>", fit_to_canvas)
+        parent.columnconfigure(0, weight=1)
+        parent.columnconfigure(1, weight=0)
+        parent.rowconfigure(0, weight=1)
 
 
     def clear_solution_word_labels(self):
@@ -331,9 +387,8 @@ class TextTwistUI:
         """
         Shuffle the puzzle letters in the UI.
         """
-        random.shuffle(self.letter_labels)
-        for i, label in enumerate(self.letter_labels):
-            label.grid(row=0, column=i)
+        self.rack.shuffle()
+        self.render_rack()
 
 
     def create_clock_frame(self, parent, width, height):
@@ -360,9 +415,14 @@ class TextTwistUI:
 
     def add_clock_to_frame(self, parent, clock):
         """
-        Add a clock to the parent frame.
+        Add a clock to the parent frame. The clock's text goes through
+        the update queue, since the clock sets it from the timer
+        thread.
         """
-        self.clock_label = tk.Label(parent, textvariable=clock.string_var,
+        clock.display_observers.add(self.clock_text.set)
+        self.clock_text.set(str(clock))
+        self.clock_label = tk.Label(parent,
+                textvariable=self.clock_text.variable,
                 font=('bitstream charter', 36), anchor="center")
         self.clock_label.grid(row=0, column=0)
 
@@ -387,25 +447,8 @@ class TextTwistUI:
         Update the letter display and text entry labels when a
         letter is typed.
         """
-        typed_letter = event.char.upper()
-        if typed_letter in ascii_uppercase:
-            for letter_label in self.letter_labels:
-                if typed_letter == letter_label['text']:
-                    self.append_letter_to_text_entry(typed_letter)
-                    letter_label['text'] = ' '
-                    break
-
-
-    def append_letter_to_text_entry(self, typed_letter):
-        """
-        Helper method for processing typed letters. Find first
-        empty/available label in the text entry area, and populate
-        it with 'typed_letter.'
-        """
-        for entry_label in self.entry_labels:
-            if entry_label['text'] == '_':
-                entry_label['text'] = typed_letter
-                break
+        if self.rack.type_letter(event.char.upper()):
+            self.render_rack()
 
 
     def validate_word(self, event):
@@ -416,8 +459,7 @@ class TextTwistUI:
         returned to the letter display area, and the entered word
         should be added to the solution area.
         """
-        word = "".join(label['text'] for label in self.entry_labels if
-                label['text'] != "_")
+        word = self.rack.word()
         if self.game.word_entry_is_valid(word):
             self.add_word_to_solution_area(word)
             self.reset_entry_and_display_letters()
@@ -426,15 +468,9 @@ class TextTwistUI:
 
     def add_word_to_solution_area(self, word, color="black"):
         """
-        Populate the first empty/available solution area label
-        with 'word'
+        Show 'word' in its solution area label.
         """
-        for solution_label in self.solution_labels:
-            if "_" in solution_label['text'] and \
-                len(solution_label['text']) == len(word):
-                solution_label['text'] = word
-                solution_label['fg'] = color
-                break
+        self.solution_labels[word].config(text=word, fg=color)
 
 
     def update_game_status(self):
@@ -468,26 +504,11 @@ class TextTwistUI:
 
     def process_backspace(self, event):
         """
-        Find last non-empty letter entry. Move that letter from entry
-        area to display area.
-        """
-        for entry_label in reversed(self.entry_labels):
-            if entry_label['text'] != '_':
-                self.move_letter_from_entry_to_display(entry_label)
-                break
-
-
-    def move_letter_from_entry_to_display(self, entry_label):
-        """
-        Helper method for processing <BackSpace>. Find first
-        available/empty letter display label, and move
-        the text of 'entry_label' to that letter display label.
+        Move the last typed letter from the entry area back to the
+        display area.
         """
-        for display_label in self.letter_labels:
-            if display_label['text'] == ' ':
-                display_label['text'] = entry_label['text']
-                entry_label['text'] = '_'
-                break
+        if self.rack.backspace():
+            self.render_rack()
 
 
     def display_missing_words(self):
@@ -495,9 +516,9 @@ class TextTwistUI:
         Populate remaining solution area labels with words that
         haven't been entered yet.
         """
-        missing_words = self.game.get_missing_solution_words()
-        for word in sorted(missing_words, key=len):
-            self.add_word_to_solution_area(word, color="red")
+        with instrumentation.phase("ui.display_missing_words"):
+            for word in self.game.get_missing_solution_words():
+                self.add_word_to_solution_area(word, color="red")
 
 
     def add_game_object_to_ui(self, game):
@@ -507,16 +528,29 @@ class TextTwistUI:
         """
         self.game = game
         self.add_clock(game.clock)
-        self.game.add_ui_callback(
-                "process_clock_reached_zero",
-                self.process_clock_reached_zero)
+        self.game.add_ui_callback("process_clock_reached_zero",
+                self.queue_clock_reached_zero)
 
 
-    def process_clock_reached_zero(self):
+    def queue_clock_reached_zero(self):
+        """
+        Queue the end of the current level for the main thread, tagged
+        with the level's run, since the clock calls this from its own
+        thread.
+        """
+        run = self.level_run
+        self.updates.put(lambda: self.process_clock_reached_zero(run))
+
+
+    def process_clock_reached_zero(self, run=None):
         """
         Update the ui to display all missing words when the
-        clock reaches zero.
+        clock reaches zero. Ignored if 'run' is not the current
+        level's run, i.e. the level ended before the update was
+        applied.
         """
+        if run is not None and run != self.level_run:
+            return
         self.display_missing_words()
         self.reset_entry_and_display_letters()
         self.toggle_root_key_bindings(OFF)
@@ -530,15 +564,17 @@ class TextTwistUI:
         """
         Populate all necessary ui areas to start the game.
         """
-        self.start_btn['state'] = DISABLED
-        self.toggle_root_key_bindings(ON)
+        with instrumentation.phase("ui.start_game"):
+            self.start_btn['state'] = DISABLED
+            self.toggle_root_key_bindings(ON)
 
-        self.game.start_game()
-        self.clear_entry_and_display_letters()
-        self.set_display_letters(self.game.get_letters())
-        self.clear_solution_word_labels()
-        self.set_solution_word_labels()
-        self.update_game_status()
+            self.game.start_game()
+            self.level_run += 1
+            self.clear_entry_and_display_letters()
+            self.set_display_letters(self.game.get_letters())
+            self.clear_solution_word_labels()
+            self.set_solution_word_labels()
+            self.update_game_status()
 
 
     def reset_game(self):
@@ -547,6 +583,7 @@ class TextTwistUI:
         """
         self.start_btn['state'] = NORMAL
         self.game.reset_game()
+        self.level_run += 1
         self.clear_entry_and_display_letters()
         self.clear_solution_word_labels()
         self.clear_game_status_labels()
@@ -554,6 +591,17 @@ class TextTwistUI:
         self.add_instruction_message()
 
 
+    def apply_queued_updates(self):
+        """
+        Apply the updates queued since the last frame, then schedule
+        the next frame, even if an update raised.
+        """
+        try:
+            self.updates.apply()
+        finally:
+            self.__root.after(FRAME_MS, self.apply_queued_updates)
+
+
     def start_mainloop(self):
         """
         tkinter main event loop
@@ -561,6 +609,77 @@ class TextTwistUI:
         self.__root.mainloop()
 
 
+class UpdateQueue:
+    """
+    Queue of UI updates, filled from any thread and applied on the
+    tkinter main thread, so that no tkinter call runs off the main
+    thread.
+
+    An update queued with a key replaces the pending update with the
+    same key, e.g. only the latest clock text of a frame is shown.
+    """
+
+    def __init__(self):
+        self.__updates = queue.SimpleQueue()
+
+
+    def put(self, func, key=None):
+        """
+        Queue the call 'func()'. Safe to call from any thread.
+        """
+        self.__updates.put((key, func))
+
+
+    def apply(self):
+        """
+        Run the queued updates, in order, skipping those replaced by a
+        later update with the same key. Must be called from the main
+        thread. Return the number of updates run.
+        """
+        pending = {}
+        queued = 0
+        while True:
+            try:
+                key, func = self.__updates.get_nowait()
+            except queue.Empty:
+                break
+            queued += 1
+            if key is None:
+                key = object()
+            pending.pop(key, None)
+            pending[key] = func
+
+        instrumentation.count("ui.merged_updates", queued - len(pending))
+        for func in pending.values():
+            func()
+        return len(pending)
+
+
+class QueuedVariable:
+    """
+    Wraps a tkinter variable so that it can be set from any thread:
+    'set' queues the update on an UpdateQueue, under 'key'.
+    """
+
+    def __init__(self, updates, variable, key):
+        self.variable = variable
+        self.__updates = updates
+        self.__key = key
+        self.__value = variable.get()
+
+
+    def get(self):
+        """
+        Get the latest value set, even if not displayed yet.
+        """
+        return self.__value
+
+
+    def set(self, value):
+        self.__value = value
+        self.__updates.put(lambda: self.variable.set(value), self.__key)
+
+
 def set_grid_width(num_words):
     """
     Helper function to set width of a grid of words
@@ -568,3 +687,13 @@ def set_grid_width(num_words):
     width = (num_words + SOLUTION_GRID_HEIGHT - 1) // SOLUTION_GRID_HEIGHT
     return max(width, MIN_SOLUTION_GRID_HEIGHT)
 
+
+def get_solution_grid(num_words, max_columns):
+    """
+    Get the width and height of the grid of 'num_words' solution words,
+    with at most 'max_columns' columns. Past that, the grid grows in
+    height instead.
+    """
+    width = min(set_grid_width(num_words), max(max_columns, 1))
+    return width, (num_words + width - 1) // width
+
@@ -4,14 +4,38 @@ words.py
 Word/file operations for text twist game.
 """
 
+import gzip
+import hashlib
+import io
+import mmap
+import pickle
 import random
 import sys
 import os
+import threading
+import time
 
-from collections import Counter
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+from array import array
+from itertools import product
+from string import ascii_uppercase
 
+import instrumentation
+
+from trie import Trie
+
+# NumPy is optional, and imported on first use by 'import_numpy': it
+# takes longer to import than the rest of the game together.
+numpy = None
+_numpy_imported = False
+
+# Solution words have MIN_WORD_LENGTH letters or more. Racks (base
+# words) have MAX_WORD_LENGTH letters by default, and at most
+# MAX_RACK_LENGTH letters.
 MIN_WORD_LENGTH = 3
 MAX_WORD_LENGTH = 6
+MAX_RACK_LENGTH = 10
 
 MIN_SOLUTION_SET_SIZE = 10
 
@@ -19,58 +43,830 @@ BASE_DIR = os.path.split(__file__)[0]
 WORDLIST_DIR = os.path.join(BASE_DIR, "wordlists")
 SIX_LETTER_WORD_FILE = os.path.join(WORDLIST_DIR, "6letterwords.txt")
 ALL_WORDS_FILE = os.path.join(WORDLIST_DIR, "allwords.txt")
+EXTENDED_WORDS_FILE = os.path.join(WORDLIST_DIR, "extendedwords.txt")
+ORIGINAL_WORD_FILE = os.path.join(WORDLIST_DIR, "original_wordlist")
+PUZZLE_CATALOG_FILE = os.path.join(WORDLIST_DIR, "puzzles.txt.gz")
+
+# Compiled dictionary files are stored next to their source file, with
+# this suffix. Bump the format version whenever their contents change.
+COMPILED_FILE_SUFFIX = ".compiled"
+COMPILED_FORMAT_VERSION = 3
+
+# dictionary file name -> compiled dictionary
+_compiled_word_files = {}
+
+# Line offset indexes are stored next to their word file, with this
+# suffix. Bump the format version whenever their layout changes.
+LINE_INDEX_SUFFIX = ".offsets"
+LINE_INDEX_FORMAT_VERSION = 2
+LINE_INDEX_HEADER = 4   # version, source size, source mtime_ns, line count
+
+# word file name -> MappedWordFile
+_mapped_word_files = {}
+_mapped_word_files_lock = threading.Lock()
+
+# (dictionary file name, base word file name, rack length)
+#   -> shared WordDictionary
+_word_dictionaries = {}
+_word_dictionaries_lock = threading.Lock()
+
+# puzzle catalog file name -> list of (base word, solution count, solutions)
+_puzzle_catalogs = {}
+
+# dictionary file name -> minimized trie (DAWG)
+_tries = {}
+
+# letter mask bit for letters outside A-Z
+OTHER_LETTERS_BIT = 1 << 26
+
+# dictionary file name -> letter count matrix (None if it can't be built)
+_letter_count_matrices = {}
+
+# Packed letter counts: 4 bits per letter, A-M in one 64-bit int and N-Z
+# in another. The top bit of each field is a guard bit, so counts go up
+# to PACKED_MAX_COUNT.
+PACKED_FIELD_BITS = 4
+PACKED_LETTERS_PER_INT = 13
+PACKED_MAX_COUNT = 7
+PACKED_GUARDS = int("8" * PACKED_LETTERS_PER_INT, 16)
+
+# upper bound on the size of the temporary arrays used by 'screen_racks'
+SCREEN_RACKS_CHUNK_BYTES = 1 << 24
+
+# default number of racks whose solutions a WordDictionary remembers
+SOLUTION_CACHE_SIZE = 4096
+
+# seconds between checks of a WordDictionary's file for changes
+WORD_FILE_CHECK_INTERVAL = 1.0
+
+class WordDictionary:
+    """
+    Word lists for text twist puzzles
+
+    Holds the dictionary of solution words and the list of base words
+    for puzzles. Both are loaded and validated once, lazily on first
+    use. A WordDictionary is safe to share between threads, and
+    'get_word_dictionary' returns one instance per pair of files and
+    rack length, shared by the whole process.
+
+    The solutions of recently solved racks are kept in an LRU cache,
+    keyed by the rack's signature, so anagram racks share an entry.
+    When the dictionary file changes, it is reloaded and the cache is
+    cleared.
+    """
+
+    def __init__(self, filename=ALL_WORDS_FILE,
+            base_word_file=SIX_LETTER_WORD_FILE, catalog_file=None,
+            min_solutions=MIN_SOLUTION_SET_SIZE, rack_length=MAX_WORD_LENGTH,
+            min_word_length=MIN_WORD_LENGTH, cache_size=SOLUTION_CACHE_SIZE):
+        """
+        Create a dictionary of the solution words in 'filename' and the
+        base words in 'base_word_file'. Base words are drawn from the
+        puzzle catalog 'catalog_file' instead, if given, or from the
+        words in 'filename' with 'rack_length' letters if neither file
+        is given. Base words have at least 'min_solutions' solution
+        words, and solution words have at least 'min_word_length'
+        letters. The solutions of up to 'cache_size' racks are cached.
+        """
+        self.filename = filename
+        self.base_word_file = base_word_file
+        self.catalog_file = catalog_file
+        self.min_solutions = min_solutions
+        self.rack_length = rack_length
+        self.min_word_length = min_word_length
+        self.solution_cache = LRUCache(cache_size)
+
+        self.__lock = threading.RLock()
+        self.__loaded = None            # (words, index, generation)
+        self.__generation = 0           # number of loads of the file
+        self.__file_stat = None         # (size, mtime_ns) when loaded
+        self.__next_file_check = 0
+        self.__base_words = None
+
+
+    def random_base_word(self, rng=random):
+        """
+        Choose a random base word with enough solution words, drawing
+        from 'rng' (the global random state by default).
+
+        With a puzzle catalog, this is one draw from the catalog
+        entries with enough solutions. Otherwise, random base words
+        are drawn until one has enough solutions.
+        """
+        base_words = self._get_base_words()
+
+        with instrumentation.phase("words.choose_base_word"):
+            if self.catalog_file is not None:
+                return rng.choice(base_words)
+
+            base_word = rng.choice(base_words)
+            while len(self.solution_positions(base_word)) < \
+                self.min_solutions:
+                instrumentation.count("words.retries")
+                base_word = rng.choice(base_words)
+            return base_word
+
+
+    def qualifying_base_words(self):
+        """
+        Get the list of all base words with enough solution words, in
+        base word file order.
+        """
+        base_words = self._get_base_words()
+        if self.catalog_file is not None:
+            return list(base_words)
+        return [base_word for base_word in base_words if
+                len(self._get_solution_positions(base_word)) >=
+                self.min_solutions]
+
+
+    def solutions(self, rack):
+        """
+        Get a list of all words in the dictionary that can be made from
+        the letters in 'rack', in dictionary file order.
+        """
+        words, _ = self._get_words()
+        with instrumentation.phase("words.solutions"):
+            return [words[i] for i in self._get_solution_positions(rack)]
+
+
+    def solution_positions(self, rack):
+        """
+        Get the sorted positions in the dictionary file of all words
+        that can be made from the letters in 'rack'.
+
+        Every distinct sub-multiset of the letters in 'rack' is looked
+        up in the signature index of the dictionary, instead of testing
+        each dictionary word in turn.
+        """
+        return list(self._get_solution_positions(rack))
+
+
+    def _get_solution_positions(self, rack):
+        """
+        Get the sorted positions of the solutions of 'rack' as a tuple,
+        from the solution cache if possible.
+        """
+        words, index, generation = self._load()
+        key = (generation, get_signature(rack))
+        positions = self.solution_cache.get(key)
+        if positions is not None:
+            return positions
+
+        positions = []
+        candidates = 0
+        for signature in get_sub_signatures(rack, self.min_word_length):
+            positions.extend(index.get(signature, ()))
+            candidates += 1
+        positions.sort()
+        instrumentation.count("words.candidates_tested", candidates)
+
+        positions = tuple(positions)
+        self.solution_cache.put(key, positions)
+        return positions
+
+
+    def contains(self, word):
+        """
+        Check if 'word' is in the dictionary.
+        """
+        words, index = self._get_words()
+        return any(words[i] == word for i in
+                index.get(get_signature(word), ()))
+
+
+    def generation(self):
+        """
+        Get the number of times the dictionary file has been loaded,
+        which changes whenever its words may have changed.
+        """
+        return self._load()[2]
+
+
+    def _get_words(self):
+        """
+        Get the dictionary word list and its signature index, loading
+        them on first use.
+        """
+        words, index, _ = self._load()
+        return words, index
+
+
+    def _load(self):
+        """
+        Get a tuple of the dictionary word list, its signature index
+        and the number of times the file has been loaded. The file is
+        loaded on first use, and reloaded if it has changed since, which
+        is checked at most every WORD_FILE_CHECK_INTERVAL seconds.
+        """
+        loaded = self.__loaded
+        if loaded is not None and time.monotonic() >= self.__next_file_check:
+            self.__next_file_check = time.monotonic() + \
+                WORD_FILE_CHECK_INTERVAL
+            if get_file_stat(self.filename) != self.__file_stat:
+                with self.__lock:
+                    if self.__loaded is loaded:
+                        forget_word_file(self.filename)
+                        self.__loaded = None
+                        self.__base_words = None
+                        self.solution_cache.clear()
+
+        # only the local copy is returned, as a reload in another thread
+        # may reset self.__loaded at any time outside the lock
+        loaded = self.__loaded
+        if loaded is None:
+            with self.__lock:
+                loaded = self.__loaded
+                if loaded is None:
+                    validate_file_name(self.filename)
+                    compiled = load_compiled_word_file(self.filename)
+                    self.__file_stat = (compiled["size"], compiled["mtime_ns"])
+                    self.__generation += 1
+                    self.__next_file_check = time.monotonic() + \
+                        WORD_FILE_CHECK_INTERVAL
+                    loaded = self.__loaded = (compiled["words"],
+                            compiled["signature_index"], self.__generation)
+        return loaded
+
+
+    def _get_base_words(self):
+        """
+        Get the list of base words to choose from, loading it on
+        first use.
+        """
+        base_words = self.__base_words
+        if base_words is None:
+            with self.__lock:
+                base_words = self.__base_words
+                if base_words is None:
+                    if self.catalog_file is not None:
+                        base_words = [base_word for base_word, count, _
+                            in load_puzzle_catalog(self.catalog_file)
+                            if count >= self.min_solutions]
+                    elif self.base_word_file is None:
+                        words, _ = self._get_words()
+                        base_words = [word for word in words
+                            if len(word) == self.rack_length]
+                    else:
+                        base_words = get_mapped_word_file(self.base_word_file)
+                    self.__base_words = base_words
+        if isinstance(base_words, MappedWordFile):
+            # mapped again if the base word file has changed
+            return get_mapped_word_file(self.base_word_file)
+        return base_words
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts its least recently used entry when
+    full. Counts its hits, misses and evictions. Safe to share between
+    threads.
+    """
+
+    def __init__(self, size, name="words.cache"):
+        """
+        Create an empty cache of at most 'size' entries. Lookups are
+        counted by instrumentation as '<name>_hits' and '<name>_misses'.
+        """
+        self.size = size
+        self.__hit_counter = f"{name}_hits"
+        self.__miss_counter = f"{name}_misses"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+
+    def get(self, key):
+        """
+        Get the value cached for 'key', or None.
+        """
+        with self.__lock:
+            value = self.__entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.__entries.move_to_end(key)
+        instrumentation.count(self.__hit_counter if value is not None
+                else self.__miss_counter)
+        return value
+
+
+    def put(self, key, value):
+        """
+        Cache 'value' for 'key', evicting the least recently used
+        entry if the cache is full.
+        """
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            if len(self.__entries) > self.size:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+
+    def clear(self):
+        """
+        Remove all entries. The counters are kept.
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+    def stats(self):
+        """
+        Get the counters and the number of entries as a dict.
+        """
+        with self.__lock:
+            return {"size": self.size, "entries": len(self.__entries),
+                    "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+
+class MappedWordFile(Sequence):
+    """
+    Read-only sequence of the words in a word file, one word per line.
+
+    The file is memory mapped, together with its line offset index, so
+    getting a word by position (e.g. with 'random.choice') costs one
+    slice of the file, and process memory does not grow with the size
+    of the file.
+    """
+
+    def __init__(self, filename):
+        """
+        Map the word file 'filename' and its line offset index, which
+        is built first if it is missing or out of date. The size and
+        modification time of the mapped file are kept in 'file_stat'.
+        Exit if the word file is missing, e.g. deleted since it was
+        last mapped.
+        """
+        validate_file_name(filename)
+        self.filename = filename
+        self.file_stat = get_file_stat(filename)
+        self.next_file_check = time.monotonic() + WORD_FILE_CHECK_INTERVAL
+        self.__offsets = load_line_index(filename)
+        if len(self.__offsets) > 1:
+            with open(filename, "rb") as f:
+                self.__words = mmap.mmap(f.fileno(), 0,
+                        access=mmap.ACCESS_READ)
+        else:
+            self.__words = b""
+
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("word index out of range")
+        return self.__words[self.__offsets[i]:self.__offsets[i + 1]] \
+            .strip().decode("utf-8")
+
+
+def get_word_dictionary(filename=ALL_WORDS_FILE,
+        base_word_file=SIX_LETTER_WORD_FILE, rack_length=MAX_WORD_LENGTH):
+    """
+    Get the process-wide WordDictionary for a dictionary file, a base
+    word file and a rack length. For the default files, base words are
+    drawn from the precomputed puzzle catalog when it exists.
+    """
+    key = (filename, base_word_file, rack_length)
+    with _word_dictionaries_lock:
+        if key not in _word_dictionaries:
+            catalog_file = None
+            if key == (ALL_WORDS_FILE, SIX_LETTER_WORD_FILE,
+                MAX_WORD_LENGTH) and os.path.exists(PUZZLE_CATALOG_FILE):
+                catalog_file = PUZZLE_CATALOG_FILE
+            _word_dictionaries[key] = WordDictionary(filename, base_word_file,
+                    catalog_file, rack_length=rack_length)
+        return _word_dictionaries[key]
+
+
+def get_rack_dictionary(rack_length=MAX_WORD_LENGTH):
+    """
+    Get the process-wide WordDictionary for puzzles with racks of
+    'rack_length' letters. Six letter racks use the default word lists;
+    longer racks draw both base words and solutions from the extended
+    word list.
+    """
+    if not MAX_WORD_LENGTH <= rack_length <= MAX_RACK_LENGTH:
+        raise ValueError(f"Rack length must be between {MAX_WORD_LENGTH} "
+                f"and {MAX_RACK_LENGTH}.")
+    if rack_length == MAX_WORD_LENGTH:
+        return get_word_dictionary()
+    return get_word_dictionary(EXTENDED_WORDS_FILE, None, rack_length)
+
 
 def get_six_letter_word(filename=SIX_LETTER_WORD_FILE):
     """
     Choose a random six letter word from the specified dictionary file.
     """
-    validate_file_name(filename)
+    return get_word_dictionary(base_word_file=filename).random_base_word()
+
+def get_words_from_base_word(base_word, filename=ALL_WORDS_FILE):
+    """
+    Get a list of all words that can be made from the letters in the
+    first argument 'base_word'. Select words from an optional dictionary
+    file, or the defaul, "allwords.txt."
+    """
+    return get_word_dictionary(filename).solutions(base_word)
+
+
+def get_solution_positions(base_word, filename=ALL_WORDS_FILE):
+    """
+    Get the sorted positions in the dictionary file of all words
+    that can be made from the letters in 'base_word'.
+    """
+    return get_word_dictionary(filename).solution_positions(base_word)
+
+
+def get_puzzle(min_solutions=MIN_SOLUTION_SET_SIZE,
+        catalog_file=PUZZLE_CATALOG_FILE):
+    """
+    Choose a random puzzle from the puzzle catalog. Return a tuple
+    of the base word and the list of its solution words. Only base
+    words with at least 'min_solutions' solutions are considered.
+    """
+    catalog = load_puzzle_catalog(catalog_file)
+    qualifying = [entry for entry in catalog if entry[1] >= min_solutions]
+    if not qualifying:
+        raise ValueError(f"No puzzle in '{catalog_file}' has at least "
+                f"{min_solutions} solutions.")
+
+    base_word, _, solutions = random.choice(qualifying)
+    return base_word, solutions.split()
+
+
+def build_puzzle_catalog(catalog_file=PUZZLE_CATALOG_FILE,
+        base_word_file=SIX_LETTER_WORD_FILE, filename=ALL_WORDS_FILE,
+        min_solutions=0):
+    """
+    Write the puzzle catalog: one line per base word in
+    'base_word_file' with at least 'min_solutions' solutions, holding
+    the base word, its solution count and its solution words from
+    'filename', separated by spaces. The catalog is gzip compressed.
+    """
+    validate_file_name(base_word_file)
+
+    # fixed gzip header timestamp, so rebuilds are byte-for-byte identical
+    with gzip.GzipFile(catalog_file, "wb", mtime=0) as compressed, \
+        io.TextIOWrapper(compressed) as catalog:
+        for base_word in load_compiled_word_file(base_word_file)["words"]:
+            solutions = get_words_from_base_word(base_word, filename)
+            if len(solutions) >= min_solutions:
+                catalog.write(f"{base_word} {len(solutions)} "
+                        f"{' '.join(solutions)}\n")
+
+    _puzzle_catalogs.pop(catalog_file, None)
+
+
+def load_puzzle_catalog(catalog_file=PUZZLE_CATALOG_FILE):
+    """
+    Get the entries of a puzzle catalog as a list of (base word,
+    solution count, space separated solutions) tuples. The catalog
+    is read once, on first use.
+    """
+    if catalog_file not in _puzzle_catalogs:
+        catalog = []
+        with gzip.open(catalog_file, "rt") as lines:
+            for line in lines:
+                base_word, count, solutions = line.rstrip("\n").split(" ", 2)
+                catalog.append((base_word, int(count), solutions))
+        _puzzle_catalogs[catalog_file] = catalog
+    return _puzzle_catalogs[catalog_file]
 
+
+def read_word_file(filename):
+    """
+    Read all words from a dictionary file, one word per line. Exit
+    if any line is not a single alphabetic word.
+    """
     try:
-        with open(filename, "r") as words:
+        with instrumentation.phase("words.read_word_file"), \
+            open(filename, "r") as words:
             word_list = []
             for i, word in enumerate(words):
                 word = word.strip()
-                if not word.isalpha() or word.split()[0] != word:
-                    raise ValueError(
-                        f"Formatting error on line {i+1} of '{filename}'.")
+                validate_word(word, i + 1, filename)
                 word_list.append(word)
     except ValueError as error:
         print(error, "Exiting.")
         sys.exit()
-    
-    base_word = word_list[random.randint(0, len(word_list)-1)]
-    words_from_base_word = get_words_from_base_word(base_word)
 
-    while (len(words_from_base_word) < MIN_SOLUTION_SET_SIZE):
-        base_word = word_list[random.randint(0, len(word_list)-1)]
-        words_from_base_word = get_words_from_base_word(base_word)
+    instrumentation.count("words.lines_scanned", len(word_list))
+    return word_list
 
-    return base_word
 
-def get_words_from_base_word(base_word, filename=ALL_WORDS_FILE):
+def get_signature(word):
     """
-    Get a list of all words that can be made from the letters in the
-    first argument 'base_word'. Select words from an optional dictionary
-    file, or the defaul, "allwords.txt."
+    Get the anagram signature of 'word', i.e. its letters in sorted
+    order. All anagrams of a word share the same signature.
     """
-    validate_file_name(filename)
+    return "".join(sorted(word))
+
 
+def get_sub_signatures(base_word, min_length=1):
+    """
+    Generate the signature of every distinct sub-multiset of the
+    letters in 'base_word' with at least 'min_length' letters. A six
+    letter word has at most 2^6 - 1 non-empty ones, a ten letter word
+    at most 2^10 - 1.
+    """
+    letter_counts = sorted(Counter(base_word).items())
+    letters = [letter for letter, _ in letter_counts]
+    count_ranges = [range(count + 1) for _, count in letter_counts]
+
+    for counts in product(*count_ranges):
+        if sum(counts) >= max(min_length, 1):
+            yield "".join(letter * n for letter, n in zip(letters, counts))
+
+
+def build_signature_index(word_list):
+    """
+    Map the signature of each word in 'word_list' to a tuple of the
+    positions of all words in the list that share it.
+    """
+    index = {}
+    for i, word in enumerate(word_list):
+        index.setdefault(get_signature(word), []).append(i)
+    return {signature: tuple(positions) for signature, positions in
+            index.items()}
+
+
+def load_trie(filename=ALL_WORDS_FILE):
+    """
+    Get the minimized trie (DAWG) of all words in a dictionary file,
+    built once, on first use.
+    """
+    if filename not in _tries:
+        _tries[filename] = Trie.from_words(
+                load_compiled_word_file(filename)["words"])
+    return _tries[filename]
+
+
+def compile_word_file(filename):
+    """
+    Read and validate a dictionary file, and build its indexes. Return
+    the compiled dictionary: a dict holding the word list, the indexes,
+    and the size, modification time and SHA-256 hash of the source.
+
+    The indexes are the signature index, the letter presence mask of
+    each word, the letter counts A-Z of each word packed into 26
+    bytes per word, and the same counts packed into two 64-bit ints
+    per word (see 'get_packed_counts').
+    """
+    with open(filename, "rb") as source:
+        digest = hashlib.sha256(source.read()).hexdigest()
+    stat = os.stat(filename)
+    word_list = read_word_file(filename)
+
+    return {
+        "version": COMPILED_FORMAT_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest,
+        "words": word_list,
+        "signature_index": build_signature_index(word_list),
+        "letter_masks": array("L", map(get_letter_mask, word_list)),
+        "letter_counts": b"".join(map(bytes, map(get_rack_counts,
+            word_list))),
+        **build_packed_counts(word_list),
+    }
+
+
+def load_compiled_word_file(filename):
+    """
+    Get the compiled dictionary for a dictionary file. It is loaded
+    once per process, from the compiled file next to the source file.
+
+    The compiled file is rebuilt when it is missing or unreadable, or
+    when the modification time of the source has changed and its
+    content hash no longer matches. If only the modification time
+    changed, the compiled file is kept and its timestamp refreshed.
+    """
+    if filename in _compiled_word_files:
+        return _compiled_word_files[filename]
+
+    compiled_file = filename + COMPILED_FILE_SUFFIX
     try:
-        with open(filename, "r") as allwords:
-            results = []
-            for i, word in enumerate(allwords):
-                word = word.strip()
-                if not word.isalpha() or word.split()[0] != word:
-                    raise ValueError(
-                        f"Formatting error on line {i+1} of '{filename}'.")
-                if base_word_contains_test_word(base_word, word):
-                    results.append(word)
+        with instrumentation.phase("words.load_compiled"), \
+            open(compiled_file, "rb") as f:
+            compiled = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        compiled = None
+
+    stat = os.stat(filename)
+    if compiled is None or compiled.get("version") != COMPILED_FORMAT_VERSION:
+        compiled = compile_word_file(filename)
+        write_compiled_word_file(compiled, compiled_file)
+    elif (compiled["size"], compiled["mtime_ns"]) != \
+        (stat.st_size, stat.st_mtime_ns):
+        with open(filename, "rb") as source:
+            digest = hashlib.sha256(source.read()).hexdigest()
+        if digest == compiled["sha256"]:
+            compiled["mtime_ns"] = stat.st_mtime_ns
+        else:
+            compiled = compile_word_file(filename)
+        write_compiled_word_file(compiled, compiled_file)
+
+    _compiled_word_files[filename] = compiled
+    return compiled
+
+
+def get_file_stat(filename):
+    """
+    Get the size and modification time of a file, or None if it can't
+    be read.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def forget_word_file(filename):
+    """
+    Drop everything loaded or built from a dictionary file, so that it
+    is loaded again on next use.
+    """
+    _compiled_word_files.pop(filename, None)
+    _tries.pop(filename, None)
+    _letter_count_matrices.pop(filename, None)
+    with _mapped_word_files_lock:
+        _mapped_word_files.pop(filename, None)
+
+
+def write_compiled_word_file(compiled, compiled_file):
+    """
+    Write a compiled dictionary to 'compiled_file'. The file is replaced
+    atomically, so concurrent readers never see a partial file. Failing
+    to write it (e.g. in a read-only directory) is not an error.
+    """
+    temp_file = f"{compiled_file}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, "wb") as f:
+            pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, compiled_file)
+    except OSError:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def get_mapped_word_file(filename):
+    """
+    Get the process-wide MappedWordFile for a word file. The file is
+    mapped again if it has changed since, which is checked at most
+    every WORD_FILE_CHECK_INTERVAL seconds.
+    """
+    with _mapped_word_files_lock:
+        mapped = _mapped_word_files.get(filename)
+        if mapped is not None and time.monotonic() >= mapped.next_file_check:
+            mapped.next_file_check = time.monotonic() + \
+                WORD_FILE_CHECK_INTERVAL
+            if get_file_stat(filename) != mapped.file_stat:
+                mapped = None
+        if mapped is None:
+            mapped = _mapped_word_files[filename] = MappedWordFile(filename)
+        return mapped
+
+
+def build_line_index(filename, index_file):
+    """
+    Write the line offset index of a word file to 'index_file': a
+    header of LINE_INDEX_HEADER unsigned 64-bit ints, followed by the
+    offset of the start of each line and the offset of the end of the
+    last line. The file is scanned through a memory map, and offsets
+    are written in chunks, so memory use does not grow with its size.
+    Every line is validated (see 'validate_word') on the way. Return
+    False if the index can't be written.
+    """
+    stat = os.stat(filename)
+    temp_file = f"{index_file}.{os.getpid()}.tmp"
+    try:
+        with open(filename, "rb") as source, open(temp_file, "wb") as index:
+            array("Q", [0] * LINE_INDEX_HEADER).tofile(index)
+            offsets = array("Q", [0])
+            count = 0
+            if stat.st_size > 0:
+                with mmap.mmap(source.fileno(), 0,
+                        access=mmap.ACCESS_READ) as words:
+                    start = 0
+                    position = words.find(b"\n")
+                    while position != -1:
+                        validate_word(words[start:position], count +
+                                len(offsets), filename)
+                        offsets.append(position + 1)
+                        if len(offsets) >= 1 << 16:
+                            count += len(offsets)
+                            offsets.tofile(index)
+                            del offsets[:]
+                        start = position + 1
+                        position = words.find(b"\n", start)
+                    if words[-1:] != b"\n":
+                        validate_word(words[start:], count + len(offsets),
+                                filename)
+                        offsets.append(len(words))
+            count += len(offsets)
+            offsets.tofile(index)
+
+            index.seek(0)
+            array("Q", [LINE_INDEX_FORMAT_VERSION, stat.st_size,
+                stat.st_mtime_ns, count - 1]).tofile(index)
+        os.replace(temp_file, index_file)
+    except OSError:
+        return False
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return True
+
+
+def load_line_index(filename):
+    """
+    Get the line offsets of a word file (see 'build_line_index') as a
+    sequence of ints, memory mapped from the index file next to the
+    word file. The index is rebuilt when it is missing, or when the
+    size or modification time of the word file has changed. If it
+    can't be written, it is built in memory instead. Exit if any line
+    of the word file is not a single alphabetic word.
+    """
+    index_file = filename + LINE_INDEX_SUFFIX
+    stat = os.stat(filename)
+    expected = [LINE_INDEX_FORMAT_VERSION, stat.st_size, stat.st_mtime_ns]
+
+    try:
+        for attempt in range(2):
+            try:
+                with open(index_file, "rb") as f:
+                    index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                header = memoryview(index)[:8 * LINE_INDEX_HEADER].cast("Q")
+                if list(header[:3]) == expected and \
+                    len(index) == 8 * (LINE_INDEX_HEADER + header[3] + 1):
+                    return memoryview(index)[8 * LINE_INDEX_HEADER:].cast("Q")
+            except (OSError, TypeError, ValueError):
+                # TypeError: truncated inside the header, which then
+                # can't be cast to 8 byte ints
+                pass
+            if attempt == 0 and not build_line_index(filename, index_file):
+                break
+
+        # unwritable directory: keep the index in memory
+        with open(filename, "rb") as f:
+            offsets = array("Q", [0])
+            for i, line in enumerate(f):
+                validate_word(line.rstrip(b"\n"), i + 1, filename)
+                offsets.append(offsets[-1] + len(line))
+        return offsets
     except ValueError as error:
         print(error, "Exiting.")
         sys.exit()
 
-    return results
+
+def validate_word(word, line_number, filename):
+    """
+    Raise a ValueError if 'word', line 'line_number' of the word file
+    'filename' (as str or bytes), is not a single alphabetic word once
+    stripped.
+    """
+    if isinstance(word, bytes):
+        word = word.decode("utf-8", "replace")
+    word = word.strip()
+    if not word.isalpha() or word.split()[0] != word:
+        raise ValueError(
+            f"Formatting error on line {line_number} of '{filename}'.")
+
+
+def time_word_file_load(filename):
+    """
+    Time loading a dictionary file. Return a tuple of the cold start
+    time (parse, validate and index the source, then write the compiled
+    file) and the warm start time (load the compiled file) in seconds.
+    """
+    _compiled_word_files.pop(filename, None)
+    start = time.perf_counter()
+    write_compiled_word_file(compile_word_file(filename),
+            filename + COMPILED_FILE_SUFFIX)
+    cold = time.perf_counter() - start
+
+    _compiled_word_files.pop(filename, None)
+    start = time.perf_counter()
+    load_compiled_word_file(filename)
+    warm = time.perf_counter() - start
+
+    return cold, warm
 
 
 def base_word_contains_test_word(base_word, test_word):
@@ -81,20 +877,270 @@ def base_word_contains_test_word(base_word, test_word):
         raise ValueError("Arguments to method " \
             + "'base_word_contains_test_word' cannot be empty strings")
 
-    base_word = Counter(base_word)
-    test_word = Counter(test_word)
-
-    # if 'test_word' has letters that are not in 'base_word',
-    # the following subtraction will result in negative values in
-    # the 'base_word' counter
-    base_word.subtract(test_word)
-    if min(base_word.values()) >= 0:
-        return True
-    else:
+    # if 'test_word' has letters that are not in 'base_word', there is
+    # no need to count letters
+    if get_letter_mask(test_word) & ~get_letter_mask(base_word):
         return False
 
+    return all(base_word.count(letter) >= test_word.count(letter)
+            for letter in set(test_word))
+
+
+def get_letter_mask(word):
+    """
+    Get the letter presence mask of 'word': bit i is set if the word
+    contains the i-th letter of A-Z. Bit 26 is set if the word contains
+    any other letter.
+    """
+    mask = 0
+    for letter in word:
+        if letter in ascii_uppercase:
+            mask |= 1 << (ord(letter) - ord("A"))
+        else:
+            mask |= OTHER_LETTERS_BIT
+    return mask
+
+
+def scan_words_in_rack(rack, filename=ALL_WORDS_FILE):
+    """
+    Get a list of all words in the dictionary file that can be made
+    from the letters in 'rack', by scanning the precomputed letter
+    masks of all words. Only words whose letters all appear in the
+    rack have their letter counts compared.
+    """
+    compiled = load_compiled_word_file(filename)
+    word_list = compiled["words"]
+    packed_counts = compiled["letter_counts"]
+
+    rack_mask = get_letter_mask(rack)
+    rack_counts = get_rack_counts(rack)
+    rack_letters = [i for i, count in enumerate(rack_counts) if count]
+    outside_rack = ~rack_mask
+
+    results = []
+    for i, mask in enumerate(compiled["letter_masks"]):
+        if mask & outside_rack:
+            continue
+        if mask & OTHER_LETTERS_BIT:
+            fits = base_word_contains_test_word(rack, word_list[i])
+        else:
+            offset = 26 * i
+            fits = all(packed_counts[offset + letter] <= rack_counts[letter]
+                    for letter in rack_letters)
+        if fits:
+            results.append(word_list[i])
+
+    return results
+
+
+def get_packed_counts(word, clamp=False):
+    """
+    Pack the letter counts of 'word' into a tuple of two ints: the
+    count of the i-th letter of A-M is in bits 4i to 4i+2 of the first,
+    and that of N-Z in the second. Bit 4i+3 of each is left clear, as a
+    guard bit for 'packed_contains'.
+
+    Return None if 'word' has other letters, or a letter more than
+    PACKED_MAX_COUNT times. With 'clamp', other letters are ignored and
+    counts are capped at PACKED_MAX_COUNT instead, which is how racks
+    are packed.
+    """
+    packed = [0, 0]
+    for i, count in enumerate(get_rack_counts(word)):
+        if count > PACKED_MAX_COUNT:
+            if not clamp:
+                return None
+            count = PACKED_MAX_COUNT
+        half, field = divmod(i, PACKED_LETTERS_PER_INT)
+        packed[half] |= count << (PACKED_FIELD_BITS * field)
+    if not clamp and any(letter not in ascii_uppercase for letter in word):
+        return None
+    return packed[0], packed[1]
+
+
+def packed_contains(packed_rack, packed_word):
+    """
+    Check if a rack holds all of the letters of a word, both packed
+    by 'get_packed_counts': subtract each field of the word from the
+    field of the rack with its guard bit set. The subtraction never
+    borrows across fields, and a field's guard bit stays set exactly
+    when the rack has enough of that letter.
+    """
+    return ((packed_rack[0] | PACKED_GUARDS) - packed_word[0]) & \
+        PACKED_GUARDS == PACKED_GUARDS and \
+        ((packed_rack[1] | PACKED_GUARDS) - packed_word[1]) & \
+        PACKED_GUARDS == PACKED_GUARDS
+
+
+def build_packed_counts(word_list):
+    """
+    Pack the letter counts of each word in 'word_list'. Return a dict
+    with the "packed_low" and "packed_high" arrays of 64-bit ints (16
+    bytes per word), and the tuple of the "unpacked" positions of words
+    that can't be packed. Those get a low int that never fits a rack,
+    and are checked letter by letter.
+    """
+    low = array("Q")
+    high = array("Q")
+    unpacked = []
+    for i, word in enumerate(word_list):
+        packed = get_packed_counts(word)
+        if packed is None:
+            # the lowest field minus any rack field leaves its guard clear
+            packed = (1 << (PACKED_FIELD_BITS - 1), 0)
+            unpacked.append(i)
+        low.append(packed[0])
+        high.append(packed[1])
+    return {"packed_low": low, "packed_high": high,
+            "unpacked": tuple(unpacked)}
+
+
+def scan_words_in_rack_packed(rack, filename=ALL_WORDS_FILE):
+    """
+    Get a list of all words in the dictionary file that can be made
+    from the letters in 'rack', by testing the packed letter counts of
+    every word with a guarded subtraction (see 'packed_contains'). No
+    per-word objects are created.
+    """
+    compiled = load_compiled_word_file(filename)
+    word_list = compiled["words"]
+    if not rack:
+        return []
+
+    rack_low, rack_high = get_packed_counts(rack, clamp=True)
+    rack_low |= PACKED_GUARDS
+    rack_high |= PACKED_GUARDS
+    guards = PACKED_GUARDS
+    packed_high = compiled["packed_high"]
+    positions = [i for i, low in enumerate(compiled["packed_low"])
+            if (rack_low - low) & guards == guards and
+            (rack_high - packed_high[i]) & guards == guards]
+
+    unpacked = [i for i in compiled["unpacked"]
+            if base_word_contains_test_word(rack, word_list[i])]
+    if unpacked:
+        positions = sorted(positions + unpacked)
+    return [word_list[i] for i in positions]
+
+
+def get_letter_count_matrix(filename=ALL_WORDS_FILE):
+    """
+    Get the N x 26 uint8 matrix holding the count of each letter A-Z in
+    each of the N words of a dictionary file. Return None if NumPy is
+    not installed, or if the file has words with other letters.
+    """
+    if filename in _letter_count_matrices:
+        return _letter_count_matrices[filename]
+
+    matrix = None
+    word_list = load_compiled_word_file(filename)["words"]
+    if import_numpy() is not None and \
+        all(letter in ascii_uppercase for letter in set("".join(word_list))):
+        lengths = numpy.fromiter(map(len, word_list), dtype=numpy.intp,
+                count=len(word_list))
+        letters = numpy.frombuffer("".join(word_list).encode("ascii"),
+                dtype=numpy.uint8) - ord("A")
+        matrix = numpy.zeros((len(word_list), 26), dtype=numpy.uint8)
+        numpy.add.at(matrix,
+                (numpy.repeat(numpy.arange(len(word_list)), lengths), letters),
+                1)
+
+    _letter_count_matrices[filename] = matrix
+    return matrix
+
+
+def import_numpy():
+    """
+    Import NumPy on first use. Return the module, or None if it is
+    not installed.
+    """
+    global numpy, _numpy_imported
+    if not _numpy_imported:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy, _numpy_imported = module, True
+    return numpy
+
+
+def get_rack_counts(rack):
+    """
+    Get the count of each letter A-Z in 'rack' as a list of 26 ints.
+    Other characters are ignored, since no dictionary word in a letter
+    count matrix can use them.
+    """
+    counts = [0] * 26
+    for letter in rack:
+        if letter in ascii_uppercase:
+            counts[ord(letter) - ord("A")] += 1
+    return counts
+
+
+def get_words_in_rack(rack, filename=ALL_WORDS_FILE):
+    """
+    Get a list of all words in the dictionary file that can be made
+    from the letters in 'rack', using one vectorized comparison against
+    the letter count matrix of the file. Without NumPy, this is the
+    same as 'get_words_from_base_word'.
+    """
+    matrix = get_letter_count_matrix(filename)
+    if matrix is None:
+        return get_words_from_base_word(rack, filename)
+
+    word_list = load_compiled_word_file(filename)["words"]
+    rack_counts = numpy.array(get_rack_counts(rack), dtype=numpy.uint8)
+    fits = (matrix <= rack_counts).all(axis=1)
+    if not rack:
+        fits[:] = False
+
+    return [word_list[i] for i in numpy.flatnonzero(fits)]
+
+
+def screen_racks(racks, filename=ALL_WORDS_FILE):
+    """
+    Check which words in the dictionary file can be made from each of
+    the letter racks in 'racks'. Return a boolean matrix with one row
+    per rack and one column per dictionary word: a NumPy array, or a
+    list of lists when NumPy is not installed.
+    """
+    racks = list(racks)
+    matrix = get_letter_count_matrix(filename)
+    if matrix is None:
+        num_words = len(load_compiled_word_file(filename)["words"])
+        screened = []
+        for rack in racks:
+            row = [False] * num_words
+            for i in get_solution_positions(rack, filename):
+                row[i] = True
+            screened.append(row)
+        return screened
+
+    rack_matrix = numpy.array([get_rack_counts(rack) for rack in racks],
+            dtype=numpy.uint8).reshape(len(racks), 26)
+    screened = numpy.empty((len(racks), len(matrix)), dtype=bool)
+
+    # Compare one letter at a time, in chunks of racks, which keeps the
+    # temporary arrays to one chunk x words instead of x words x 26.
+    columns = numpy.ascontiguousarray(matrix.T)
+    chunk = max(1, SCREEN_RACKS_CHUNK_BYTES // max(1, len(matrix)))
+    for start in range(0, len(racks), chunk):
+        screened_chunk = screened[start:start + chunk]
+        screened_chunk[:] = True
+        for letter in range(26):
+            screened_chunk &= columns[letter] <= \
+                rack_matrix[start:start + chunk, letter, numpy.newaxis]
+    for i, rack in enumerate(racks):
+        if not rack:
+            screened[i] = False
+
+    return screened
+
+
 def validate_file_name(filename):
-    if not is_valid_file_name(filename):
+    with instrumentation.phase("words.validate_file_name"):
+        valid = is_valid_file_name(filename)
+    if not valid:
         import os
         print(f"'{os.path.abspath(filename)}' is not a valid file. Exiting.")
         sys.exit()
@@ -123,5 +1169,12 @@ def is_valid_file_name(filename):
 if __name__ == '__main__':
     if len(sys.argv) == 1:
         print(get_six_letter_word())
+    elif sys.argv[1] == "--build-catalog":
+        build_puzzle_catalog()
+    elif sys.argv[1] == "--timing":
+        for filename in sys.argv[2:] or [SIX_LETTER_WORD_FILE, ALL_WORDS_FILE]:
+            cold, warm = time_word_file_load(filename)
+            print(f"{os.path.basename(filename)}: cold {cold*1000:.1f} ms, "
+                    f"warm {warm*1000:.1f} ms")
     elif len(sys.argv) == 2:
         print(get_words_from_base_word(sys.argv[1]))